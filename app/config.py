@@ -1,8 +1,11 @@
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
 
+BASE_DIR = Path(__file__).parent.parent
+
 
 class Settings:
     DASHSCOPE_API_KEY = os.getenv("DASHSCOPE_API_KEY")  # 阿里云API Key
@@ -15,11 +18,21 @@ class Settings:
     DOUYIN_TOKEN = os.getenv("DOUYIN_ACCESS_TOKEN")
 
     # DEEPSEEK_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
-    DEEPSEEK_URL = "https://api.deepseek.com"
+    DEEPSEEK_URL = os.getenv("DEEPSEEK_URL", "https://api.deepseek.com")
     VOLCANO_IMAGE_SERVICE = "cv"  # 文生图服务标识
+    # 服务地址可通过环境变量指向本地替身服务（见 bench/）
+    VOLCANO_VISUAL_HOST = os.getenv("VOLCANO_VISUAL_HOST")  # 默认使用 SDK 内置地址
+    VOLCANO_VISUAL_SCHEME = os.getenv("VOLCANO_VISUAL_SCHEME", "https")
+    ARK_BASE_URL = os.getenv("ARK_BASE_URL", "https://ark.cn-beijing.volces.com/api/v3")
     VOLCANO_VIDEO_URL = "https://open.volcengineapi.com/vod/v1/video_ai/gen"
     DOUYIN_UPLOAD_URL = "https://open.douyin.com/api/v2/video/upload/"
 
+    # 文生图：异步模式下各场景先提交任务，由集中轮询器统一查询结果
+    IMAGE_ASYNC = os.getenv("IMAGE_ASYNC", "1") == "1"
+    IMAGE_RETURN_BASE64 = os.getenv("IMAGE_RETURN_BASE64", "1") == "1"  # 结果直接返回图片数据，省去一次下载
+    IMAGE_POLL_INTERVAL = 1  # 秒
+    IMAGE_GENERATION_TIMEOUT = 120  # 秒
+
     # TTS 相关配置
     APPID = os.getenv("APPID")  # 新增 APPID 配置
     ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")  # 新增 ACCESS_TOKEN 配置
@@ -31,14 +44,98 @@ class Settings:
     ARK_API_KEY = os.getenv("ARK_API_KEY")
 
     VIDEO_GENERATION_TIMEOUT = 600  # 秒
-    POLLING_INTERVAL = 5  # 秒
+    POLLING_INTERVAL = 5  # 秒，集中轮询的最短间隔
+    POLLING_MAX_INTERVAL = 30  # 秒，集中轮询的最长间隔
+    POLLING_BATCH_SIZE = 50  # 单次批量查询的任务数
+    VIDEO_EXPECTED_DURATION = 90  # 秒，尚无观测数据时假定的生成耗时
+
+    # 视频引擎：ark 远程生成；local 本地图片运镜；auto 优先 Ark，过慢或超时时改用本地
+    VIDEO_ENGINE = os.getenv("VIDEO_ENGINE", "auto")
+    LOCAL_ENGINE_LATENCY_THRESHOLD = int(os.getenv("LOCAL_ENGINE_LATENCY_THRESHOLD", 300))  # 秒，Ark 耗时 P90 阈值
+    LOCAL_CLIP_DURATION = 5  # 秒，本地引擎默认片段时长（与 Ark 默认一致）
+
+    # 对冲请求：图片/视频生成超过近期耗时分位数仍未返回时发出重复请求，取先完成者
+    HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "1") == "1"
+    HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", 95))
+    HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", 20))  # 耗时样本不足时不对冲
+    HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", 0.1))  # 对冲请求数占原始请求数的上限
 
-    TTS_API_ENDPOINT = "https://openspeech.bytedance.com/api/v1/tts"
+    TTS_API_ENDPOINT = os.getenv("TTS_API_ENDPOINT", "https://openspeech.bytedance.com/api/v1/tts")
     TTS_VOICE_TYPE = "zh_male_M392_conversation_wvae_bigtts"
     TTS_TIMEOUT = 30  # 秒
+    # 分镜已全部确定时，各场景解说合并为一次请求；流式分镜（STORYBOARD_STREAMING）下场景逐个加入任务图、
+    # 语音随场景立即开始，此配置不生效
+    TTS_BATCH = os.getenv("TTS_BATCH", "1") == "1"
+    TTS_BATCH_MAX_BYTES = 1000  # 单次请求文本的 UTF-8 字节数上限
+
+    # 先合成解说再按其时长生成视频（Ark 提示词 --dur），超出单片段上限时串联多个片段
+    NARRATION_FIRST = os.getenv("NARRATION_FIRST", "0") == "1"
+    ARK_CLIP_DURATIONS = [5, 10]  # 秒，模型支持的生成时长
 
 
     MAX_RETRIES = 3
 
+    # 流水线并发配置：单个任务内同时执行的节点（图片/视频/语音/合并）上限
+    PIPELINE_MAX_CONCURRENCY = int(os.getenv("PIPELINE_MAX_CONCURRENCY", 8))
+    STORYBOARD_STREAMING = os.getenv("STORYBOARD_STREAMING", "1") == "1"  # 边生成分镜边启动场景任务
+
+    # 长视频模式：文案按段落切分，各段分镜并发生成后按顺序拼接
+    LONG_FORM_TARGET_SCENES = int(os.getenv("LONG_FORM_TARGET_SCENES", 30))
+    STORYBOARD_SCENES_PER_SECTION = int(os.getenv("STORYBOARD_SCENES_PER_SECTION", 6))
+    STORYBOARD_CONCURRENCY = int(os.getenv("STORYBOARD_CONCURRENCY", 8))  # 同时进行的分段请求数
+    STORYBOARD_TOKENS_PER_SCENE = 150  # 按分镜数估算单次请求的 max_tokens
+
+    # 执行器配置：I/O 线程池用于供应商接口调用，CPU 进程池用于音视频编码
+    IO_MAX_WORKERS = int(os.getenv("IO_MAX_WORKERS", 64))
+    CPU_MAX_WORKERS = int(os.getenv("CPU_MAX_WORKERS", 0))  # 0 表示按可用核数自动计算
+    ENCODE_THREADS = int(os.getenv("ENCODE_THREADS", 0))  # 单次编码的线程数，0 表示自动
+
+    # 成片编码配置：所有场景片段统一参数编码，成片通过 concat 流拷贝拼接
+    VIDEO_WIDTH = int(os.getenv("VIDEO_WIDTH", 720))
+    VIDEO_HEIGHT = int(os.getenv("VIDEO_HEIGHT", 960))
+    VIDEO_FPS = int(os.getenv("VIDEO_FPS", 24))
+    VIDEO_GOP = int(os.getenv("VIDEO_GOP", 48))  # 帧，固定关键帧间隔
+    AUDIO_SAMPLE_RATE = 44100
+    RENDER_BACKEND = os.getenv("RENDER_BACKEND", "ffmpeg")  # ffmpeg：单次滤镜图渲染；moviepy：逐帧处理
+    STREAM_COPY_CONCAT = os.getenv("STREAM_COPY_CONCAT", "1") == "1"  # 0 表示始终用 moviepy 重新编码拼接
+    CONCAT_WINDOW = int(os.getenv("CONCAT_WINDOW", 8))  # 重新编码拼接时同时打开的片段数上限
+
+    # 下载配置：流式写盘、断点续传，大文件分段并行
+    DOWNLOAD_TIMEOUT = int(os.getenv("DOWNLOAD_TIMEOUT", 30))  # 秒，连接/读取超时
+    DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", 1024 * 1024))
+    DOWNLOAD_MAX_ATTEMPTS = int(os.getenv("DOWNLOAD_MAX_ATTEMPTS", 5))
+    DOWNLOAD_PARALLEL_PARTS = int(os.getenv("DOWNLOAD_PARALLEL_PARTS", 4))  # 1 表示不分段
+    DOWNLOAD_PARALLEL_MIN_BYTES = int(os.getenv("DOWNLOAD_PARALLEL_MIN_BYTES", 16 * 1024 * 1024))
+
+    # 任务队列配置：任务目录可放在多台渲染机共享的存储上
+    TEMP_DIR = Path(os.getenv("TEMP_DIR", BASE_DIR / "tmp"))
+    JOB_LEASE_TTL = int(os.getenv("JOB_LEASE_TTL", 60))  # 秒，租约超时后任务可被其他 worker 接管
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+    WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", 2))  # 单个 worker 同时处理的任务数
+    WORKER_POLL_INTERVAL = 2  # 秒
+    EMBEDDED_WORKERS = int(os.getenv("EMBEDDED_WORKERS", 1))  # API 进程内置 worker 的并发任务数，0 表示只提供接口
+    WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", 0))  # 独立 worker 的 Prometheus 指标端口，0 表示不提供
+    WARM_UP = os.getenv("WARM_UP", "1") == "1"  # worker 启动后在后台预加载供应商 SDK、拉起编码进程
+    WARM_UP_DELAY = float(os.getenv("WARM_UP_DELAY", 1))  # 秒，等服务完成启动后再预热
+
+    # 性能剖析：开启后任务目录中写入 profile.prof（cProfile）与 profile.collapsed（折叠栈，可生成火焰图）
+    PROFILE_JOBS = os.getenv("PROFILE_JOBS", "0") == "1"  # 单个任务也可通过请求参数 profile 开启
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))  # 秒，采样间隔
+
+    # 产物缓存配置：需与 TEMP_DIR 位于同一文件系统才能硬链接
+    ARTIFACT_CACHE_ENABLED = os.getenv("ARTIFACT_CACHE_ENABLED", "1") == "1"
+    ARTIFACT_CACHE_DIR = Path(os.getenv("ARTIFACT_CACHE_DIR", TEMP_DIR / ".cache"))
+    ARTIFACT_CACHE_MAX_BYTES = int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", 10 * 1024 ** 3))
+    # 命中统计写入 stats/ 的最短间隔（秒），进程退出时补写
+    ARTIFACT_CACHE_STATS_FLUSH_INTERVAL = float(os.getenv("ARTIFACT_CACHE_STATS_FLUSH_INTERVAL", 10))
+
+    # LLM 响应缓存与重试预算
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+    # SQLite 在 NFS/SMB 等共享存储上加锁不可靠，必须放在本机磁盘，不能放进多台机器共享的 TEMP_DIR
+    LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", BASE_DIR / "tmp" / "llm.sqlite3"))
+    LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))  # 秒
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+    LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", 3))  # 单次调用的总尝试次数（SDK 内部不再重试）
+
 
 settings = Settings()
\ No newline at end of file
@@ -1,10 +1,30 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 class VideoRequest(BaseModel):
     input_content: str
     is_url: bool = False
     schedule_time: str = "2025-02-26 22:00:00"
+    resume: bool = False  # 跳过任务目录中已完成且有效的阶段
+    stream_storyboard: Optional[bool] = None  # 流式分镜，默认取 STORYBOARD_STREAMING 配置
+    long_form: bool = False  # 长视频模式：文案分段并发生成分镜
+    target_scenes: Optional[int] = None  # 长视频模式的目标场景数，默认取 LONG_FORM_TARGET_SCENES 配置
+    narration_first: Optional[bool] = None  # 按解说时长决定视频生成时长，默认取 NARRATION_FIRST 配置
+    video_engine: Optional[str] = None  # ark / local / auto，默认取 VIDEO_ENGINE 配置
+    profile: Optional[bool] = None  # 剖析 CPU 密集阶段，结果写入任务目录，默认取 PROFILE_JOBS 配置
 
 class SceneScript(BaseModel):
     description: str
-    narration: str
\ No newline at end of file
+    narration: str
+
+class JobRecord(BaseModel):
+    task_id: str
+    request: VideoRequest
+    status: str = "queued"  # queued / running / succeeded / failed
+    attempts: int = 0
+    worker: Optional[str] = None
+    error: Optional[str] = None
+    final_path: Optional[str] = None
+    created_at: float
+    updated_at: float
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import time
+import weakref
+from typing import Dict, Optional
+
+from app.config import settings
+from app.services.video_gen_core import (
+    delete_video_generation_task_async,
+    get_video_generation_task_async,
+    list_video_generation_tasks_async
+)
+from app.utils import metrics
+from app.utils.latency import get_tracker
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class _TrackedTask:
+    def __init__(self, task_id: str, future: asyncio.Future, submitted_at: float):
+        self.task_id = task_id
+        self.future = future
+        self.submitted_at = submitted_at
+        self.next_check = submitted_at
+
+
+class ArkTaskPoller:
+    """
+    Ark 视频生成任务的集中轮询器
+    所有在途任务共用一个协程，按 list(task_ids=...) 批量查询状态，
+    并根据任务已等待时长与近期实际完成耗时自适应调整各任务的查询间隔。
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, _TrackedTask] = {}
+        self._durations = get_tracker("ark_video")
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    def expected_duration(self) -> float:
+        """近期任务完成耗时的中位数"""
+        median = self._durations.percentile(50)
+        return settings.VIDEO_EXPECTED_DURATION if median is None else median
+
+    def watch(self, task_id: str, submitted_at: Optional[float] = None) -> asyncio.Future:
+        """
+        登记任务，返回在任务进入终态时完成的 future（结果为任务信息）
+        :param task_id: Ark 任务 ID
+        :param submitted_at: 任务提交时间，默认当前时间
+        """
+        tracked = self._tasks.get(task_id)
+        if tracked is None:
+            future = asyncio.get_running_loop().create_future()
+            tracked = _TrackedTask(task_id, future, submitted_at or time.time())
+            self._tasks[task_id] = tracked
+            self._wakeup.set()
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.ensure_future(self._run())
+        return tracked.future
+
+    async def wait(self, task_id: str, submitted_at: Optional[float] = None):
+        """
+        等待任务进入终态，超时抛出 TimeoutError（远端任务会被删除）
+        等待方被取消时 future 一并取消，下一轮查询时不再跟踪该任务
+        """
+        return await self.watch(task_id, submitted_at)
+
+    def _interval(self, age: float) -> float:
+        """距离预期完成还早时稀疏查询，接近预期时密集查询，远超预期后逐步放缓"""
+        expected = self.expected_duration()
+        if age < expected * 0.5:
+            interval = expected * 0.5 - age
+        elif age < expected * 1.5:
+            interval = settings.POLLING_INTERVAL
+        else:
+            interval = age * 0.1
+        return min(max(interval, settings.POLLING_INTERVAL), settings.POLLING_MAX_INTERVAL)
+
+    async def _run(self):
+        while self._tasks:
+            now = time.time()
+            due = [t for t in self._tasks.values() if t.next_check <= now]
+
+            for start in range(0, len(due), settings.POLLING_BATCH_SIZE):
+                batch = due[start:start + settings.POLLING_BATCH_SIZE]
+                try:
+                    await self._check_batch(batch)
+                except Exception as e:
+                    logger.error(f"轮询异常: {str(e)}", exc_info=True)
+                    for tracked in batch:
+                        tracked.next_check = time.time() + settings.POLLING_INTERVAL
+
+            if not self._tasks:
+                break
+            delay = max(0.0, min(t.next_check for t in self._tasks.values()) - time.time())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _check_batch(self, batch):
+        # 等待方已放弃（协程被取消）的任务不再查询
+        for tracked in batch:
+            if tracked.future.done():
+                self._tasks.pop(tracked.task_id, None)
+        batch = [t for t in batch if t.task_id in self._tasks]
+        if not batch:
+            return
+
+        ids = [t.task_id for t in batch]
+        try:
+            result = await list_video_generation_tasks_async(page_num=1, page_size=len(ids), task_ids=ids)
+            infos = {item.id: item for item in (getattr(result, "items", None) or [])}
+        except Exception as e:
+            logger.error(f"批量查询失败，本轮改为逐个查询: {str(e)}")
+            infos = {}
+
+        now = time.time()
+        for tracked in batch:
+            info = infos.get(tracked.task_id)
+            if info is None:
+                try:
+                    info = await get_video_generation_task_async(tracked.task_id)
+                except Exception as e:
+                    logger.error(f"查询任务 {tracked.task_id} 失败: {str(e)}")
+
+            age = now - tracked.submitted_at
+            if info is not None and info.status in TERMINAL_STATUSES:
+                if info.status == "succeeded":
+                    self._durations.record(age)
+                    metrics.PROVIDER_SECONDS.labels("ark", "generate").observe(age)
+                self._finish(tracked, result=info)
+            elif age > settings.VIDEO_GENERATION_TIMEOUT:
+                await self._expire(tracked)
+            else:
+                tracked.next_check = now + self._interval(age)
+
+        logger.debug(f"本轮查询 {len(batch)} 个任务，在途 {self.in_flight} 个，预期耗时 {self.expected_duration():.0f} 秒")
+
+    async def _expire(self, tracked: _TrackedTask):
+        # 超时也计入耗时记录，供自动选择本地引擎时判断 Ark 是否过慢
+        self._durations.record(time.time() - tracked.submitted_at)
+        metrics.TIMEOUTS.labels("ark", "generate").inc()
+        try:
+            await delete_video_generation_task_async(tracked.task_id)
+        except Exception as e:
+            logger.error(f"删除超时任务 {tracked.task_id} 失败: {str(e)}")
+        self._finish(tracked, error=TimeoutError("视频生成超时"))
+
+    def _finish(self, tracked: _TrackedTask, result=None, error: Optional[Exception] = None):
+        self._tasks.pop(tracked.task_id, None)
+        if tracked.future.done():
+            return
+        if error is not None:
+            tracked.future.set_exception(error)
+        else:
+            tracked.future.set_result(result)
+
+
+_pollers = weakref.WeakKeyDictionary()
+
+
+def get_poller() -> ArkTaskPoller:
+    """获取当前事件循环的轮询器（每个事件循环一个）"""
+    loop = asyncio.get_running_loop()
+    poller = _pollers.get(loop)
+    if poller is None:
+        poller = ArkTaskPoller()
+        _pollers[loop] = poller
+    return poller
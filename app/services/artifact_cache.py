@@ -0,0 +1,221 @@
+import atexit
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from app.config import settings
+from app.utils import metrics
+from app.utils.executors import run_io
+from app.utils.hashing import params_hash
+
+logger = logging.getLogger(__name__)
+
+# 内容寻址的产物缓存：
+#   <ARTIFACT_CACHE_DIR>/objects/<key[:2]>/<key><suffix>   缓存对象，key = sha256(类型 + 生成参数)
+#   <ARTIFACT_CACHE_DIR>/stats/<host>-<pid>.json          各进程的命中统计，至多每 ARTIFACT_CACHE_STATS_FLUSH_INTERVAL 秒写一次
+# 命中时以硬链接放入任务目录（跨设备时退化为复制），对象 mtime 即最近使用时间，
+# 总大小超过 ARTIFACT_CACHE_MAX_BYTES 时按 LRU 淘汰。
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_stats = {}
+_stats_dirty = False
+_stats_flushed_at = 0.0
+_total_bytes = None
+
+
+def _objects_dir() -> Path:
+    return settings.ARTIFACT_CACHE_DIR / "objects"
+
+
+def _object_path(kind: str, params: Any, suffix: str) -> Path:
+    key = params_hash({"kind": kind, "params": params})
+    return _objects_dir() / key[:2] / f"{key}{suffix}"
+
+
+def _place(src: Path, dest: Path):
+    """把 src 以硬链接放到 dest（原子替换），跨设备时复制"""
+    tmp_path = dest.with_name(f".{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dest)
+
+
+def _count(kind: str, hit: bool, size: int = 0):
+    metrics.count_cache("artifact", kind, hit)
+    with _lock:
+        entry = _stats.setdefault(kind, {"hits": 0, "misses": 0, "bytes_saved": 0})
+        if hit:
+            entry["hits"] += 1
+            entry["bytes_saved"] += size
+        else:
+            entry["misses"] += 1
+        global _stats_dirty
+        _stats_dirty = True
+    flush_stats(force=False)
+
+
+def flush_stats(force: bool = True):
+    """把本进程的命中统计写入 stats/，force 为 False 时距上次写入不足间隔则跳过"""
+    global _stats_dirty, _stats_flushed_at
+    # 写入串行化，避免较旧的快照覆盖较新的
+    with _flush_lock:
+        with _lock:
+            now = time.monotonic()
+            if not _stats_dirty or (not force and now - _stats_flushed_at < settings.ARTIFACT_CACHE_STATS_FLUSH_INTERVAL):
+                return
+            snapshot = json.dumps(_stats)
+            _stats_dirty = False
+            _stats_flushed_at = now
+
+        stats_dir = settings.ARTIFACT_CACHE_DIR / "stats"
+        os.makedirs(stats_dir, exist_ok=True)
+        stats_path = stats_dir / f"{socket.gethostname()}-{os.getpid()}.json"
+        tmp_path = stats_path.with_suffix(".tmp")
+        tmp_path.write_text(snapshot, encoding="utf-8")
+        os.replace(tmp_path, stats_path)
+
+
+atexit.register(flush_stats)
+
+
+def fetch(kind: str, params: Any, dest: Path) -> bool:
+    """
+    查找缓存并放入任务目录
+    :param kind: 产物类型（image / tts / video）
+    :param params: 决定产物内容的全部参数
+    :param dest: 目标路径
+    :return: 是否命中
+    """
+    if not settings.ARTIFACT_CACHE_ENABLED:
+        return False
+    obj = _object_path(kind, params, Path(dest).suffix)
+    try:
+        size = obj.stat().st_size
+        _place(obj, Path(dest))
+        os.utime(obj)  # 更新最近使用时间
+    except FileNotFoundError:
+        _count(kind, hit=False)
+        return False
+    _count(kind, hit=True, size=size)
+    logger.info(f"产物缓存命中 [{kind}] {obj.name} -> {dest}")
+    return True
+
+
+def store(kind: str, params: Any, src: Path):
+    """把新生成的产物写入缓存"""
+    if not settings.ARTIFACT_CACHE_ENABLED:
+        return
+    global _total_bytes
+    src = Path(src)
+    obj = _object_path(kind, params, src.suffix)
+    os.makedirs(obj.parent, exist_ok=True)
+    _place(src, obj)
+
+    with _lock:
+        if _total_bytes is not None:
+            _total_bytes += obj.stat().st_size
+        need_evict = _total_bytes is None or _total_bytes > settings.ARTIFACT_CACHE_MAX_BYTES
+    if need_evict:
+        evict()
+
+
+def evict():
+    """按最近使用时间淘汰缓存对象，直到总大小降到上限的 90%"""
+    global _total_bytes
+    objects = []
+    for path in _objects_dir().glob("*/*"):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        objects.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in objects)
+    if total > settings.ARTIFACT_CACHE_MAX_BYTES:
+        target = settings.ARTIFACT_CACHE_MAX_BYTES * 0.9
+        for _, size, path in sorted(objects):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        logger.info(f"产物缓存淘汰完成，当前大小 {total / 1024 / 1024:.1f}MB")
+
+    with _lock:
+        _total_bytes = total
+
+
+def cached(kind: str, params: Any, dest: Path, produce: Callable[[], Path]) -> Path:
+    """
+    带缓存地生成产物：命中则直接链接到 dest，否则调用 produce 生成后写入缓存
+    :param kind: 产物类型
+    :param params: 决定产物内容的全部参数
+    :param dest: 目标路径
+    :param produce: 生成函数，返回产物路径
+    :return: 产物路径
+    """
+    dest = Path(dest)
+    if fetch(kind, params, dest):
+        return dest
+    # 生成前先断开旧文件，避免原地写入污染与之硬链接的缓存对象
+    _unlink(dest)
+    path = produce()
+    store(kind, params, path)
+    return path
+
+
+async def cached_async(kind: str, params: Any, dest: Path, produce: Callable[[], Awaitable[Path]]) -> Path:
+    """cached 的异步版本，produce 为协程函数"""
+    dest = Path(dest)
+    if await run_io(fetch, kind, params, dest):
+        return dest
+    await run_io(_unlink, dest)
+    path = await produce()
+    await run_io(store, kind, params, path)
+    return path
+
+
+def _unlink(path: Path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def stats() -> dict:
+    """汇总所有进程的缓存命中统计（其他进程的统计至多滞后一个写入间隔）"""
+    flush_stats()
+    totals = {}
+    for path in (settings.ARTIFACT_CACHE_DIR / "stats").glob("*.json"):
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (ValueError, OSError):
+            continue
+        for kind, entry in data.items():
+            total = totals.setdefault(kind, {"hits": 0, "misses": 0, "bytes_saved": 0})
+            for field in total:
+                total[field] += entry.get(field, 0)
+
+    for total in totals.values():
+        requests = total["hits"] + total["misses"]
+        total["hit_rate"] = round(total["hits"] / requests, 4) if requests else 0.0
+
+    size = 0
+    for path in _objects_dir().glob("*/*"):
+        try:
+            size += path.stat().st_size
+        except FileNotFoundError:
+            # 统计期间被其他进程淘汰
+            continue
+    return {"kinds": totals, "size_bytes": size, "max_bytes": settings.ARTIFACT_CACHE_MAX_BYTES}
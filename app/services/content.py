@@ -1,49 +1,95 @@
 import logging
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from app.utils.api_clients import deepseek_request
+from app.config import settings
+from app.utils import llm_cache, metrics
+from app.utils.api_clients import deepseek_request, deepseek_request_async, forget_response
+from app.utils.executors import run_io
 
 logger = logging.getLogger(__name__)
 
+# 唯一的重试层：deepseek_request 与 SDK 内部均不再重试，
+# 单次 process_input 最多发起 LLM_MAX_ATTEMPTS 次请求
+_retry_budget = retry(
+    stop=stop_after_attempt(settings.LLM_MAX_ATTEMPTS),
+    wait=wait_exponential(multiplier=1, min=2, max=10),
+    retry=retry_if_exception_type((ConnectionError, ValueError)),
+    before_sleep=lambda retry_state: metrics.RETRIES.labels("content").inc(),
+    reraise=True
+)
+
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
 def process_input(content: str, is_url: bool) -> str:
-    try:
-        if is_url:
-            result = _summarize_website(content)
-        else:
-            result = _expand_topic(content)
+    stage_inputs = {"input_content": content, "is_url": is_url}
+    cached = llm_cache.get_stage("content", stage_inputs)
+    if cached is not None:
+        return cached
+
+    result = _process_input(content, is_url)
+    llm_cache.put_stage("content", stage_inputs, result)
+    return result
+
+
+async def process_input_async(content: str, is_url: bool) -> str:
+    """process_input 的异步版本"""
+    stage_inputs = {"input_content": content, "is_url": is_url}
+    cached = await run_io(llm_cache.get_stage, "content", stage_inputs)
+    if cached is not None:
+        return cached
 
-        # 验证结果长度
-        if len(result) < 100:
+    result = await _process_input_async(content, is_url)
+    await run_io(llm_cache.put_stage, "content", stage_inputs, result)
+    return result
+
+
+@_retry_budget
+def _process_input(content: str, is_url: bool) -> str:
+    prompt = _build_prompt(content, is_url)
+    try:
+        result = deepseek_request(prompt)
+        if not _is_valid(result):
+            forget_response(prompt)
             raise ValueError("生成内容过短，可能未成功")
+        return result
+    except Exception as e:
+        logger.error(f"内容处理失败: {str(e)}")
+        raise
+
 
+@_retry_budget
+async def _process_input_async(content: str, is_url: bool) -> str:
+    prompt = _build_prompt(content, is_url)
+    try:
+        result = await deepseek_request_async(prompt)
+        if not _is_valid(result):
+            await run_io(forget_response, prompt)
+            raise ValueError("生成内容过短，可能未成功")
         return result
     except Exception as e:
         logger.error(f"内容处理失败: {str(e)}")
         raise
 
 
-def _summarize_website(url: str) -> str:
-    prompt = f"""请严格按照以下要求处理：
+def _is_valid(result: str) -> bool:
+    # 验证结果长度
+    return len(result) >= 100
+
+
+def _build_prompt(content: str, is_url: bool) -> str:
+    return _summarize_prompt(content) if is_url else _expand_prompt(content)
+
+
+def _summarize_prompt(url: str) -> str:
+    return f"""请严格按照以下要求处理：
     1. 用中文总结新闻内容
     2. 保留关键事实和数据
     3. 输出长度在300-500字之间
     原始内容来源：{url}"""
 
-    return deepseek_request(prompt)
-
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=2, max=10),
-    retry=retry_if_exception_type(ConnectionError)
-)
-def _expand_topic(topic: str) -> str:
-    prompt = f"""请按照以下要求扩写主题：
+def _expand_prompt(topic: str) -> str:
+    return f"""请按照以下要求扩写主题：
     1. 使用自然流畅的中文
     2. 包含具体案例或数据支撑
     3. 结构清晰（引言-论点-结论）
     4. 输出约500字
     主题：{topic}"""
-
-    return deepseek_request(prompt)
\ No newline at end of file
@@ -1,94 +1,202 @@
+import asyncio
+import base64
+import json
 import os
 import logging
+import threading
 from pathlib import Path
-from volcengine.visual.VisualService import VisualService
+from typing import Optional
 from app.config import settings
 from app.schemas import SceneScript
+from app.services import artifact_cache
+from app.services.image_poller import get_poller
+from app.services.manifest import TaskManifest, stage_inputs
+from app.utils.downloader import DownloadError, download
+from app.utils.executors import run_io
+from app.utils.hedging import hedged, shielded
+from app.utils import tracing
+from app.utils.metrics import track_call
 import requests
 logger = logging.getLogger(__name__)
 
 
 class ImageGenerator:
     def __init__(self):
-        self.service = VisualService()
-        self._setup_credentials()
+        self._service = None
+        self._service_lock = threading.Lock()
 
-    def _setup_credentials(self):
+    @property
+    def service(self):
+        """
+        火山视觉服务客户端，首次使用时创建（SDK 导入较慢，只提供接口的进程无需加载）
+        会阻塞：事件循环中通过 get_service() 获取
+        """
+        if self._service is None:
+            with self._service_lock:
+                if self._service is None:
+                    from volcengine.visual.VisualService import VisualService
+                    service = VisualService()
+                    self._setup_credentials(service)
+                    self._service = service
+        return self._service
+
+    async def get_service(self):
+        """在事件循环中获取客户端，首次创建放到 I/O 线程"""
+        if self._service is not None:
+            return self._service
+        return await run_io(getattr, self, "service")
+
+    @staticmethod
+    def _setup_credentials(service):
         """配置火山引擎认证信息"""
-        self.service.set_ak(settings.VOLCANO_AK)
-        self.service.set_sk(settings.VOLCANO_SK)
+        service.set_ak(settings.VOLCANO_AK)
+        service.set_sk(settings.VOLCANO_SK)
+        if settings.VOLCANO_VISUAL_HOST:
+            service.set_host(settings.VOLCANO_VISUAL_HOST)
+            service.set_scheme(settings.VOLCANO_VISUAL_SCHEME)
+
+    async def generate_images(self, scenes, output_dir, manifest: Optional[TaskManifest] = None):
+        """所有场景的图片同时提交，总耗时接近单张图片；失败的场景不计入结果"""
+        async def generate(idx, scene):
+            inputs = stage_inputs({"description": scene["description"]})
+            img_path = await run_io(manifest.valid_output, f"image_{idx}", inputs) if manifest else None
+            if img_path is None:
+                img_path = await self.generate_single_image_async(scene, output_dir, idx)
+                if manifest:
+                    await run_io(manifest.record, f"image_{idx}", img_path, inputs)
+            return img_path
 
-    def generate_images(self, scenes, output_dir):
+        results = await asyncio.gather(
+            *(generate(idx, scene) for idx, scene in enumerate(scenes)), return_exceptions=True
+        )
         image_paths = []
-        for idx, scene in enumerate(scenes):
-            try:
-                img_path = self._generate_single_image(scene, output_dir, idx)
-                image_paths.append(img_path)
-            except Exception as e:
-                print(f"图片生成失败: {e}")
+        for idx, result in enumerate(results):
+            if isinstance(result, Exception):
+                logger.error(f"分镜{idx}图片生成失败: {result}")
                 # 可以根据业务需求添加重试逻辑或其他处理
+                continue
+            image_paths.append(result)
         return image_paths
 
     def _generate_single_image(self, scene: SceneScript, output_dir: Path, index: int) -> Path:
-        """生成单个分镜图片"""
-        try:
-            # 构建请求参数
-            form = {
-                "req_key": "high_aes_general_v21_L",
-                "prompt": f'"{scene["description"]}"',
-                "model_version": "general_v2.1_L",
-                "width": 384,
-                "height": 512,
-                "use_sr": True,
-                "return_url": True,
-                "req_schedule_conf": "general_v20_9B_pe",
-                "logo_info": {
-                    "add_logo": True,
-                    "position": 0,
-                    "language": 0,
-                    "opacity": 0.2
-                }
+        """生成单个分镜图片（相同提示词与模型参数命中产物缓存）"""
+        form = self._build_form(scene)
+        # return_url 只影响返回方式，不影响图片内容
+        cache_params = {k: v for k, v in form.items() if k != "return_url"}
+        img_path = output_dir / f"scene_{index}.jpg"
+        return artifact_cache.cached(
+            "image", cache_params, img_path,
+            lambda: self._request_image(form, img_path, index)
+        )
+
+    async def generate_single_image_async(self, scene: SceneScript, output_dir: Path, index: int) -> Path:
+        """
+        _generate_single_image 的异步版本，请求耗时过长时发出对冲请求
+        每次请求写入各自的临时文件，采用先完成者，落败者完成后删除
+        """
+        form = self._build_form(scene)
+        cache_params = {k: v for k, v in form.items() if k != "return_url"}
+        img_path = output_dir / f"scene_{index}.jpg"
+
+        async def attempt(n: int) -> Path:
+            attempt_path = img_path.with_name(f"{img_path.stem}.attempt{n}{img_path.suffix}")
+            if settings.IMAGE_ASYNC:
+                return await self._request_image_async(form, attempt_path, index)
+            return await shielded(run_io(self._request_image, form, attempt_path, index), _remove)
+
+        async def produce() -> Path:
+            path = await hedged("image", attempt, discard=_remove)
+            await run_io(os.replace, path, img_path)
+            return img_path
+
+        return await artifact_cache.cached_async("image", cache_params, img_path, produce)
+
+    def _build_form(self, scene: SceneScript) -> dict:
+        """构建请求参数"""
+        return {
+            "req_key": "high_aes_general_v21_L",
+            "prompt": f'"{scene["description"]}"',
+            "model_version": "general_v2.1_L",
+            "width": 384,
+            "height": 512,
+            "use_sr": True,
+            "return_url": not settings.IMAGE_RETURN_BASE64,
+            "req_schedule_conf": "general_v20_9B_pe",
+            "logo_info": {
+                "add_logo": True,
+                "position": 0,
+                "language": 0,
+                "opacity": 0.2
             }
+        }
 
-            # 调用同步接口
-            response = self.service.cv_process(form)
-            # try:
-            #     res_json = json.loads(response)
-            #     if res_json.get("status") != 200:
-            #         raise Exception(f'图片审核未通过: {res_json.get("message")}')
-            # except json.JSONDecodeError:
-            #     raise Exception(f'响应内容不是有效的 JSON 格式: {response}')
-            #     # 处理成功响应
-            # img_path = os.path.join(output_dir, f"scene_{idx + 1}.jpg")
-            # # 保存图片逻辑
-            # with open(img_path, 'wb') as f:
-            #     # 写入图片数据
-            #     pass
-            # print(f"成功生成分镜{idx + 1}图片: {img_path}")
-            # return img_path
-
-            # 处理响应
+    def _request_image(self, form: dict, img_path: Path, index: int) -> Path:
+        """调用文生图同步接口并保存图片"""
+        try:
+            with track_call("volcano_image", "process"):
+                response = self.service.cv_process(form)
             if response["code"] != 10000:
                 raise ValueError(f'API错误: {response.get("message", "未知错误")}')
+            return self._save_image(response["data"], img_path, index)
 
-            if not response["data"].get("image_urls"):
-                raise ValueError("未返回有效图片URL")
+        except KeyError as e:
+            logger.error(f"响应格式错误: {str(e)}")
+            raise ValueError("无效的API响应格式")
+
+    async def _request_image_async(self, form: dict, img_path: Path, index: int) -> Path:
+        """
+        提交文生图异步任务，由集中轮询器等待结果后保存图片
+        返回方式（URL / base64）与水印参数在查询结果时通过 req_json 指定
+        """
+        result_keys = ("return_url", "logo_info")
+        submit_form = {k: v for k, v in form.items() if k not in result_keys}
+        service = await self.get_service()
+        try:
+            with track_call("volcano_image", "submit"):
+                response = await run_io(service.cv_sync2async_submit_task, submit_form)
+            if response["code"] != 10000:
+                raise ValueError(f'API错误: {response.get("message", "未知错误")}')
+            task_id = response["data"]["task_id"]
+        except KeyError as e:
+            logger.error(f"响应格式错误: {str(e)}")
+            raise ValueError("无效的API响应格式")
 
-            # 下载图片
-            img_url = response["data"]["image_urls"][0]
-            img_data = requests.get(img_url, timeout=15).content
+        logger.info(f"分镜{index}图片任务已提交 [{task_id}]")
+        result_form = {
+            "req_key": form["req_key"],
+            "task_id": task_id,
+            "req_json": json.dumps({k: form[k] for k in result_keys}, ensure_ascii=False)
+        }
+        with tracing.span("image.wait", "wait", task_id=task_id):
+            data = await get_poller().wait(service, task_id, result_form)
+        # 写文件期间被取消（对冲落败）时写完再删除
+        return await shielded(run_io(self._save_image, data, img_path, index), _remove)
 
-            # 保存文件
-            img_path = output_dir / f"scene_{index}.jpg"
-            with open(img_path, "wb") as f:
-                f.write(img_data)
+    def _save_image(self, data: dict, img_path: Path, index: int) -> Path:
+        """保存接口返回的图片：优先使用 base64 数据，否则下载 URL"""
+        try:
+            if data.get("binary_data_base64"):
+                tmp_path = img_path.with_name(img_path.name + ".part")
+                with open(tmp_path, "wb") as f:
+                    f.write(base64.b64decode(data["binary_data_base64"][0]))
+                os.replace(tmp_path, img_path)
+            elif data.get("image_urls"):
+                with track_call("volcano_image", "download"):
+                    download(data["image_urls"][0], img_path, timeout=15)
+            else:
+                raise ValueError("未返回有效图片")
 
             logger.info(f"成功生成分镜{index}图片: {img_path}")
             return img_path
 
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, DownloadError) as e:
             logger.error(f"分镜{index}下载失败: {str(e)}")
             raise
-        except KeyError as e:
-            logger.error(f"响应格式错误: {str(e)}")
-            raise ValueError("无效的API响应格式")
\ No newline at end of file
+
+
+async def _remove(path: Path):
+    """删除落败的对冲请求产物"""
+    try:
+        await run_io(os.remove, path)
+    except FileNotFoundError:
+        pass
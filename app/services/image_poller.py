@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+import weakref
+from typing import Dict, Optional
+
+from app.config import settings
+from app.utils import metrics
+from app.utils.executors import run_io
+
+logger = logging.getLogger(__name__)
+
+# 火山视觉异步任务的状态：in_queue / generating 为进行中，done 为完成，其余为失败
+PENDING_STATUSES = ("in_queue", "generating")
+
+
+class _TrackedTask:
+    def __init__(self, service, task_id: str, form: dict, future: asyncio.Future):
+        self.service = service
+        self.task_id = task_id
+        self.form = form
+        self.future = future
+        self.deadline = time.time() + settings.IMAGE_GENERATION_TIMEOUT
+
+
+class ImageTaskPoller:
+    """
+    火山文生图异步任务（CVSync2AsyncSubmitTask）的集中轮询器
+    同一任务的所有场景共用一个协程，每轮并发查询全部在途任务的结果
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, _TrackedTask] = {}
+        self._runner: Optional[asyncio.Task] = None
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    async def wait(self, service, task_id: str, form: dict) -> dict:
+        """
+        等待任务完成，返回结果中的 data 字段
+        等待方被取消时 future 一并取消，下一轮查询时不再跟踪该任务
+        :param service: VisualService 实例
+        :param task_id: 提交任务返回的任务 ID
+        :param form: 查询参数（req_key、task_id、req_json）
+        """
+        tracked = self._tasks.get(task_id)
+        if tracked is None:
+            future = asyncio.get_running_loop().create_future()
+            tracked = _TrackedTask(service, task_id, form, future)
+            self._tasks[task_id] = tracked
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.ensure_future(self._run())
+        return await tracked.future
+
+    async def _run(self):
+        while self._tasks:
+            # 新提交的任务不会立即完成，先等待一个间隔
+            await asyncio.sleep(settings.IMAGE_POLL_INTERVAL)
+            # 等待方已放弃（协程被取消）的任务不再查询
+            for tracked in list(self._tasks.values()):
+                if tracked.future.done():
+                    self._tasks.pop(tracked.task_id, None)
+            batch = list(self._tasks.values())
+            await asyncio.gather(*(self._check(t) for t in batch))
+            logger.debug(f"本轮查询 {len(batch)} 个图片任务，在途 {self.in_flight} 个")
+
+    async def _check(self, tracked: _TrackedTask):
+        try:
+            with metrics.track_call("volcano_image", "get_result"):
+                response = await run_io(tracked.service.cv_sync2async_get_result, tracked.form)
+        except Exception as e:
+            # 查询失败（网络抖动、限流）不影响任务本身，下一轮重试
+            logger.warning(f"查询图片任务 {tracked.task_id} 失败: {str(e)}")
+            response = None
+
+        if response is not None:
+            if response.get("code") != 10000:
+                self._finish(tracked, error=ValueError(f'API错误: {response.get("message", "未知错误")}'))
+                return
+            data = response.get("data") or {}
+            status = data.get("status")
+            if status == "done":
+                self._finish(tracked, result=data)
+                return
+            if status not in PENDING_STATUSES:
+                self._finish(tracked, error=ValueError(f"图片任务 {tracked.task_id} 状态异常: {status}"))
+                return
+
+        if time.time() > tracked.deadline:
+            metrics.TIMEOUTS.labels("volcano_image", "generate").inc()
+            self._finish(tracked, error=TimeoutError(f"图片任务 {tracked.task_id} 超时"))
+
+    def _finish(self, tracked: _TrackedTask, result=None, error: Optional[Exception] = None):
+        self._tasks.pop(tracked.task_id, None)
+        if tracked.future.done():
+            return
+        if error is not None:
+            tracked.future.set_exception(error)
+        else:
+            tracked.future.set_result(result)
+
+
+_pollers = weakref.WeakKeyDictionary()
+
+
+def get_poller() -> ImageTaskPoller:
+    """获取当前事件循环的轮询器（每个事件循环一个）"""
+    loop = asyncio.get_running_loop()
+    poller = _pollers.get(loop)
+    if poller is None:
+        poller = ImageTaskPoller()
+        _pollers[loop] = poller
+    return poller
@@ -0,0 +1,264 @@
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from app.config import settings
+from app.schemas import JobRecord, VideoRequest
+from app.services.remote_journal import RemoteJournal
+
+logger = logging.getLogger(__name__)
+
+# 基于共享目录的持久化任务队列：
+#   tmp/<task_id>/job.json   任务记录（状态、重试次数、结果）
+#   tmp/<task_id>/job.lease  租约文件，内容为持有者 worker ID，mtime 即心跳时间
+#   tmp/.queue/<提交时间>.<task_id>   待处理索引（queued / running），任务进入终态后删除，
+#                                    领取时只读取索引中的任务，不随历史任务增多而变慢
+# 租约通过 O_CREAT|O_EXCL 原子创建，多台共享 tmp/ 的渲染机可以安全地竞争同一任务
+JOB_FILE = "job.json"
+LEASE_FILE = "job.lease"
+QUEUE_DIR = ".queue"
+# 标记索引已由全量扫描建立（兼容索引出现之前提交的任务）
+INDEXED_MARKER = ".indexed"
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class LeaseLostError(Exception):
+    """任务租约已被其他 worker 接管"""
+    pass
+
+
+def _task_dir(task_id: str) -> Path:
+    return settings.TEMP_DIR / task_id
+
+
+def _write_record(record: JobRecord):
+    """原子写入任务记录（先写临时文件再替换）"""
+    path = _task_dir(record.task_id) / JOB_FILE
+    tmp_path = path.with_name(f"{JOB_FILE}.{os.getpid()}.tmp")
+    record.updated_at = time.time()
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record.dict(), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _queue_dir() -> Path:
+    return settings.TEMP_DIR / QUEUE_DIR
+
+
+def _index_path(record: JobRecord) -> Path:
+    # 文件名以毫秒级提交时间开头，按名称排序即按提交顺序
+    return _queue_dir() / f"{int(record.created_at * 1000):015d}.{record.task_id}"
+
+
+def _add_to_index(record: JobRecord):
+    os.makedirs(_queue_dir(), exist_ok=True)
+    _index_path(record).touch()
+
+
+def _remove_from_index(record: JobRecord):
+    try:
+        os.remove(_index_path(record))
+    except FileNotFoundError:
+        pass
+
+
+def _ensure_index():
+    """首次使用时全量扫描一次，为已有的待处理任务建立索引"""
+    marker = _queue_dir() / INDEXED_MARKER
+    if marker.exists():
+        return
+    for record in list_jobs():
+        if record.status in ACTIVE_STATUSES:
+            _add_to_index(record)
+    os.makedirs(_queue_dir(), exist_ok=True)
+    marker.touch()
+
+
+def _pending_task_ids() -> List[str]:
+    _ensure_index()
+    return [name.split(".", 1)[1] for name in sorted(os.listdir(_queue_dir())) if not name.startswith(".")]
+
+
+def _read_record(path: Path) -> Optional[JobRecord]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return JobRecord(**json.load(f))
+    except FileNotFoundError:
+        return None
+    except (ValueError, OSError) as e:
+        logger.error(f"任务记录读取失败 {path}: {str(e)}")
+        return None
+
+
+def enqueue(task_id: str, request: VideoRequest) -> JobRecord:
+    """提交任务，写入任务记录后即可由任意 worker 领取"""
+    os.makedirs(_task_dir(task_id), exist_ok=True)
+    now = time.time()
+    record = JobRecord(task_id=task_id, request=request, created_at=now, updated_at=now)
+    _write_record(record)
+    _add_to_index(record)
+    logger.info(f"任务 {task_id} 已入队")
+    return record
+
+
+def get_job(task_id: str) -> Optional[JobRecord]:
+    return _read_record(_task_dir(task_id) / JOB_FILE)
+
+
+def list_jobs(status: Optional[str] = None) -> List[JobRecord]:
+    records = []
+    for path in settings.TEMP_DIR.glob(f"*/{JOB_FILE}"):
+        record = _read_record(path)
+        if record is not None and (status is None or record.status == status):
+            records.append(record)
+    return sorted(records, key=lambda r: r.created_at)
+
+
+def _lease_expired(lease_path: Path) -> bool:
+    try:
+        return time.time() - lease_path.stat().st_mtime > settings.JOB_LEASE_TTL
+    except FileNotFoundError:
+        return True
+
+
+def _acquire_lease(task_id: str, worker_id: str) -> bool:
+    """尝试获取任务租约，过期租约会被原子地改名后接管"""
+    lease_path = _task_dir(task_id) / LEASE_FILE
+
+    if lease_path.exists():
+        if not _lease_expired(lease_path):
+            return False
+        stale_path = lease_path.with_name(f"{LEASE_FILE}.{worker_id}.stale")
+        try:
+            os.rename(lease_path, stale_path)
+        except FileNotFoundError:
+            return False
+        # 改名与判断之间租约可能刚被续期，此时归还租约
+        if not _lease_expired(stale_path):
+            try:
+                os.link(stale_path, lease_path)
+            except FileExistsError:
+                pass
+            os.remove(stale_path)
+            return False
+        os.remove(stale_path)
+
+    try:
+        fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w") as f:
+        f.write(worker_id)
+    return True
+
+
+def _owns_lease(task_id: str, worker_id: str) -> bool:
+    try:
+        with open(_task_dir(task_id) / LEASE_FILE, encoding="utf-8") as f:
+            return f.read() == worker_id
+    except FileNotFoundError:
+        return False
+
+
+def _check_lease(task_id: str, worker_id: str):
+    """写入任务状态前确认仍持有租约，租约过期被接管后不能覆盖新持有者写入的状态"""
+    if not _owns_lease(task_id, worker_id):
+        raise LeaseLostError(f"任务 {task_id} 的租约已失效，不再更新任务状态")
+
+
+def _release_lease(task_id: str, worker_id: str):
+    if _owns_lease(task_id, worker_id):
+        try:
+            os.remove(_task_dir(task_id) / LEASE_FILE)
+        except FileNotFoundError:
+            pass
+
+
+def claim(worker_id: str) -> Optional[JobRecord]:
+    """
+    领取最早提交的待处理任务
+    running 状态但租约已过期的任务视为 worker 异常退出，会被重新领取
+    :param worker_id: worker 标识
+    :return: 领取到的任务，没有可领取任务时返回 None
+    """
+    for task_id in _pending_task_ids():
+        candidate = get_job(task_id)
+        if candidate is None:
+            continue
+        if candidate.status not in ACTIVE_STATUSES:
+            _remove_from_index(candidate)
+            continue
+        if not _acquire_lease(task_id, worker_id):
+            continue
+
+        # 获得租约后重新读取，避免使用过期的状态
+        record = get_job(task_id)
+        if record is None or record.status not in ACTIVE_STATUSES:
+            _release_lease(task_id, worker_id)
+            continue
+        if record.attempts >= settings.JOB_MAX_ATTEMPTS:
+            # 上一次尝试中 worker 异常退出：不再重试，删除仍在远端排队或生成的任务
+            record.status = "failed"
+            record.error = record.error or "达到最大重试次数"
+            _write_record(record)
+            _remove_from_index(record)
+            RemoteJournal(_task_dir(task_id)).cleanup()
+            _release_lease(record.task_id, worker_id)
+            continue
+
+        record.status = "running"
+        record.attempts += 1
+        record.worker = worker_id
+        _write_record(record)
+        logger.info(f"worker {worker_id} 领取任务 {record.task_id}（第 {record.attempts} 次尝试）")
+        return record
+    return None
+
+
+def heartbeat(task_id: str, worker_id: str):
+    """续期租约，租约已被接管时抛出 LeaseLostError"""
+    if not _owns_lease(task_id, worker_id):
+        raise LeaseLostError(f"任务 {task_id} 的租约已失效")
+    os.utime(_task_dir(task_id) / LEASE_FILE)
+
+
+def complete(task_id: str, worker_id: str, final_path: str):
+    """记录成功，租约已被接管时抛出 LeaseLostError"""
+    _check_lease(task_id, worker_id)
+    record = get_job(task_id)
+    record.status = "succeeded"
+    record.final_path = final_path
+    record.error = None
+    _write_record(record)
+    _remove_from_index(record)
+    _release_lease(task_id, worker_id)
+    logger.info(f"任务 {task_id} 已完成")
+
+
+def fail(task_id: str, worker_id: str, error: str) -> JobRecord:
+    """记录失败，未达到最大尝试次数时重新入队；租约已被接管时抛出 LeaseLostError"""
+    _check_lease(task_id, worker_id)
+    record = get_job(task_id)
+    record.error = error
+    record.status = "queued" if record.attempts < settings.JOB_MAX_ATTEMPTS else "failed"
+    _write_record(record)
+    if record.status == "failed":
+        _remove_from_index(record)
+    _release_lease(task_id, worker_id)
+    logger.error(f"任务 {task_id} 失败（状态 {record.status}）: {error}")
+    return record
+
+
+def requeue(task_id: str, worker_id: str):
+    """worker 正常停止时归还任务，不计入尝试次数；租约已被接管时抛出 LeaseLostError"""
+    _check_lease(task_id, worker_id)
+    record = get_job(task_id)
+    record.status = "queued"
+    record.attempts = max(0, record.attempts - 1)
+    _write_record(record)
+    _release_lease(task_id, worker_id)
+    logger.info(f"任务 {task_id} 已归还队列")
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from app.utils.executors import run_io
+from app.utils.hashing import file_sha256, params_hash
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+
+
+def stage_inputs(params: Any = None, dep_hashes: tuple = ()) -> dict:
+    """阶段输入 = 固定参数 + 依赖产物摘要"""
+    return {"params": params, "deps": list(dep_hashes)}
+
+
+class TaskManifest:
+    """
+    任务目录清单 tmp/<task_id>/manifest.json
+    记录每个阶段的产物路径、大小、SHA-256 及输入摘要。
+    resume=True 时，产物存在且与记录一致、输入未变化的阶段直接复用。
+    """
+
+    def __init__(self, task_dir: Path, resume: bool = False):
+        self.task_dir = Path(task_dir)
+        self.resume = resume
+        self.path = self.task_dir / MANIFEST_FILE
+        self._lock = threading.Lock()
+        self.stages = self._load()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f).get("stages", {})
+        except FileNotFoundError:
+            return {}
+        except (ValueError, OSError) as e:
+            logger.error(f"清单读取失败，将重新生成: {str(e)}")
+            return {}
+
+    def _save(self):
+        tmp_path = self.path.with_name(f"{MANIFEST_FILE}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"stages": self.stages}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def valid_output(self, stage: str, inputs: Any) -> Optional[Path]:
+        """
+        校验阶段产物
+        :param stage: 阶段名称，如 video_3
+        :param inputs: 阶段输入
+        :return: 有效产物路径；未开启续跑或产物无效时返回 None
+        """
+        if not self.resume:
+            return None
+        with self._lock:
+            entry = self.stages.get(stage)
+        if not entry or entry["inputs"] != params_hash(inputs):
+            return None
+
+        output_path = self.task_dir / entry["path"]
+        try:
+            if output_path.stat().st_size != entry["size"] or file_sha256(output_path) != entry["sha256"]:
+                logger.warning(f"阶段 {stage} 的产物 {output_path} 与清单不一致，重新生成")
+                return None
+        except FileNotFoundError:
+            return None
+        return output_path
+
+    def record(self, stage: str, output_path: Path, inputs: Any):
+        """记录阶段产物"""
+        output_path = Path(output_path)
+        entry = {
+            "path": os.path.relpath(output_path, self.task_dir),
+            "size": output_path.stat().st_size,
+            "sha256": file_sha256(output_path),
+            "inputs": params_hash(inputs),
+            "completed_at": time.time()
+        }
+        with self._lock:
+            self.stages[stage] = entry
+            self._save()
+
+    def output_hash(self, output_path: Path) -> str:
+        """优先使用清单中记录的摘要，避免重复计算"""
+        output_path = Path(output_path)
+        with self._lock:
+            for entry in self.stages.values():
+                if self.task_dir / entry["path"] == output_path:
+                    return entry["sha256"]
+        return file_sha256(output_path)
+
+    def wrap(self, stage: str, func: Callable, params: Any = None) -> Callable:
+        """
+        为任务图节点增加检查点
+        节点输入 = 固定参数 params + 依赖产物（路径参数）的摘要
+        :param stage: 阶段名称
+        :param func: 原节点函数（同步或协程）
+        :param params: 影响产物的固定参数
+        :return: 协程节点函数
+        """
+        async def checkpointed(*dep_outputs):
+            dep_hashes = [await run_io(self.output_hash, path) for path in dep_outputs]
+            inputs = stage_inputs(params, dep_hashes)
+
+            cached = await run_io(self.valid_output, stage, inputs)
+            if cached is not None:
+                logger.info(f"阶段 {stage} 已完成，复用 {cached}")
+                return cached
+
+            if asyncio.iscoroutinefunction(func):
+                output_path = await func(*dep_outputs)
+            else:
+                output_path = await run_io(func, *dep_outputs)
+            await run_io(self.record, stage, output_path, inputs)
+            return output_path
+
+        return checkpointed
@@ -0,0 +1,205 @@
+import json
+import logging
+from functools import partial
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional
+
+from app.config import settings
+from app.schemas import VideoRequest
+from app.services import content, storyboard, video_gen
+from app.services.image_gen import ImageGenerator
+from app.services.manifest import TaskManifest
+from app.utils import encode_scheduler, metrics
+from app.utils.executors import run_io
+from app.utils.task_graph import TaskGraph
+
+logger = logging.getLogger(__name__)
+
+CONTENT_FILE = "content.txt"
+SCENES_FILE = "scenes.json"
+
+
+async def process_video(request: VideoRequest, task_dir: Path, image_generator: ImageGenerator,
+                        resume: Optional[bool] = None) -> Path:
+    """
+    完整的视频生成流程：内容处理 -> 分镜生成 -> 图片/视频/语音 -> 合成
+    :param request: 视频请求
+    :param task_dir: 任务输出目录
+    :param image_generator: 图片生成器
+    :param resume: 是否跳过清单中已完成的阶段，默认取 request.resume
+    :return: 最终视频路径
+    """
+    manifest = TaskManifest(task_dir, resume=request.resume if resume is None else resume)
+    logger.info(f"开始处理任务 {task_dir.name}（续跑：{manifest.resume}）")
+
+    # 1. 内容处理
+    processed_content = await checkpoint_text(
+        manifest, "content", CONTENT_FILE,
+        {"input_content": request.input_content, "is_url": request.is_url},
+        lambda: content.process_input_async(request.input_content, request.is_url)
+    )
+    logger.info(f"内容处理完成，长度：{len(processed_content)}字符")
+
+    # 2-5. 分镜生成 -> 图片生成 / 视频生成 / 视频合成（按场景依赖图并发执行）
+    streaming = settings.STORYBOARD_STREAMING if request.stream_storyboard is None else request.stream_storyboard
+    narration_first = settings.NARRATION_FIRST if request.narration_first is None else request.narration_first
+    engine = request.video_engine or settings.VIDEO_ENGINE
+    scenes_inputs = {"content": processed_content}
+    if request.long_form:
+        # 长视频：分段并发生成分镜
+        target_scenes = request.target_scenes or settings.LONG_FORM_TARGET_SCENES
+        scenes_inputs.update(long_form=True, target_scenes=target_scenes)
+        scenes_json = await checkpoint_text(
+            manifest, "scenes", SCENES_FILE, scenes_inputs,
+            lambda: generate_long_form_scenes_json(processed_content, target_scenes)
+        )
+        final_path = await render_video(json.loads(scenes_json), task_dir, image_generator, manifest,
+                                        narration_first, engine)
+    elif streaming and await run_io(manifest.valid_output, "scenes", scenes_inputs) is None:
+        # 流式分镜：每个分镜一闭合就开始其图片/视频/语音生成
+        final_path = await render_video_streaming(processed_content, task_dir, image_generator, manifest,
+                                                  narration_first, engine)
+    else:
+        scenes_json = await checkpoint_text(
+            manifest, "scenes", SCENES_FILE, scenes_inputs,
+            lambda: generate_scenes_json(processed_content)
+        )
+        scenes = json.loads(scenes_json)
+        logger.info(f"分镜结果： {scenes}，文件路径：{str(task_dir)}")
+        final_path = await render_video(scenes, task_dir, image_generator, manifest, narration_first, engine)
+    logger.info(f"视频合成结果 {final_path}")
+
+    # 6. 发布
+    # publish_response = publisher.publish_video(final_path, request.schedule_time)
+
+    return final_path
+
+
+async def render_video(scenes: List[dict], task_dir: Path, image_generator: ImageGenerator,
+                       manifest: Optional[TaskManifest] = None, narration_first: bool = False,
+                       engine: str = "ark") -> Path:
+    """
+    按依赖图渲染整条视频
+    每个场景独立执行 图片 -> 视频 -> 合并 链路，语音与图片/视频并行，
+    所有场景合并完成后再拼接成片
+    :param scenes: 场景描述列表
+    :param task_dir: 任务输出目录
+    :param image_generator: 图片生成器
+    :param manifest: 任务清单
+    :param narration_first: 先合成语音，按解说时长生成视频
+    :param engine: 视频引擎 ark / local / auto
+    :return: 最终视频路径
+    """
+    manifest = manifest or TaskManifest(task_dir)
+    graph = TaskGraph(settings.PIPELINE_MAX_CONCURRENCY)
+
+    tts_batch_node = video_gen.add_tts_batch_node(graph, scenes, task_dir, manifest)
+    merge_nodes = [
+        _add_scene(graph, scene, idx, task_dir, image_generator, manifest, narration_first, tts_batch_node, engine)
+        for idx, scene in enumerate(scenes)
+    ]
+    graph.add("combine", manifest.wrap("combine", partial(combine_scenes, task_dir)), deps=merge_nodes)
+
+    logger.info(f"任务 {task_dir.name} 共 {len(scenes)} 个场景，最大并发 {graph.max_concurrency}")
+    results = await graph.run()
+    return results["combine"]
+
+
+async def render_video_streaming(processed_content: str, task_dir: Path, image_generator: ImageGenerator,
+                                 manifest: TaskManifest, narration_first: bool = False,
+                                 engine: str = "ark") -> Path:
+    """
+    流式分镜 + 渲染：分镜节点边接收模型输出边向任务图加入场景，
+    场景 0 的图片/视频/语音在模型仍在输出后续分镜时就已开始
+    :param processed_content: 处理后的文案
+    :param task_dir: 任务输出目录
+    :param image_generator: 图片生成器
+    :param manifest: 任务清单
+    :param narration_first: 先合成语音，按解说时长生成视频
+    :param engine: 视频引擎 ark / local / auto
+    :return: 最终视频路径
+    """
+    graph = TaskGraph(settings.PIPELINE_MAX_CONCURRENCY)
+
+    async def produce_scenes():
+        scenes, merge_nodes = [], []
+        async for scene in storyboard.stream_scenes_async(processed_content):
+            scene = scene.dict()
+            logger.info(f"收到分镜 {len(scenes)}：{scene}")
+            merge_nodes.append(
+                _add_scene(graph, scene, len(scenes), task_dir, image_generator, manifest, narration_first,
+                           engine=engine)
+            )
+            scenes.append(scene)
+
+        output_path = task_dir / SCENES_FILE
+        await run_io(output_path.write_text, json.dumps(scenes, ensure_ascii=False), encoding="utf-8")
+        await run_io(manifest.record, "scenes", output_path, {"content": processed_content})
+
+        graph.add("combine", manifest.wrap("combine", partial(combine_scenes, task_dir)), deps=merge_nodes)
+        logger.info(f"任务 {task_dir.name} 分镜输出完成，共 {len(scenes)} 个场景")
+        return scenes
+
+    # 分镜节点在运行中加入其他节点，不能整体重试
+    graph.add("scenes", produce_scenes)
+    results = await graph.run()
+    return results["combine"]
+
+
+def _add_scene(graph: TaskGraph, scene: dict, idx: int, task_dir: Path,
+               image_generator: ImageGenerator, manifest: TaskManifest, narration_first: bool = False,
+               tts_batch_node: Optional[str] = None, engine: str = "ark") -> str:
+    """加入单个场景的 图片 -> 视频 -> 合并 链路及语音节点，返回合并节点名称"""
+    image_node = graph.add(
+        f"image_{idx}",
+        manifest.wrap(
+            f"image_{idx}",
+            partial(image_generator.generate_single_image_async, scene, task_dir, idx),
+            {"description": scene["description"]}
+        ),
+        retries=settings.MAX_RETRIES
+    )
+    return video_gen.add_scene_nodes(
+        graph, scene, idx, task_dir, image_node, manifest, narration_first, tts_batch_node, engine
+    )
+
+
+async def checkpoint_text(manifest: TaskManifest, stage: str, filename: str, inputs: dict,
+                          produce: Callable[[], Awaitable[str]]) -> str:
+    """
+    文本类阶段（文案、分镜）的检查点：结果写入任务目录并记入清单
+    :param manifest: 任务清单
+    :param stage: 阶段名称
+    :param filename: 结果文件名
+    :param inputs: 阶段输入
+    :param produce: 生成结果的协程函数
+    :return: 阶段结果文本
+    """
+    cached = await run_io(manifest.valid_output, stage, inputs)
+    if cached is not None:
+        logger.info(f"阶段 {stage} 已完成，复用 {cached}")
+        return cached.read_text(encoding="utf-8")
+
+    with metrics.track_stage(stage):
+        result = await produce()
+    output_path = manifest.task_dir / filename
+    await run_io(output_path.write_text, result, encoding="utf-8")
+    await run_io(manifest.record, stage, output_path, inputs)
+    return result
+
+
+async def generate_scenes_json(processed_content: str) -> str:
+    """生成分镜并序列化为 JSON 文本"""
+    scenes = await storyboard.generate_scenes_async(processed_content)
+    return json.dumps([scene.dict() for scene in scenes], ensure_ascii=False)
+
+
+async def generate_long_form_scenes_json(processed_content: str, target_scenes: int) -> str:
+    """生成长视频分镜并序列化为 JSON 文本"""
+    scenes = await storyboard.generate_long_form_scenes_async(processed_content, target_scenes)
+    return json.dumps([scene.dict() for scene in scenes], ensure_ascii=False)
+
+
+async def combine_scenes(task_dir: Path, *video_paths: Path) -> Path:
+    """拼接所有场景视频（经编码调度器提交到 CPU 进程池）"""
+    return await encode_scheduler.submit(video_gen.combine_videos, list(video_paths), task_dir)
@@ -2,10 +2,12 @@ import requests
 import json
 from app.config import settings
 from app.utils.api_clients import volcano_sign_request
+from app.utils.metrics import instrument
 from pathlib import Path
 import time
 
 
+@instrument("douyin", "publish")
 def publish_video(video_path: Path, schedule_time: str = None):
     # 第一步：初始化上传
     init_url = "https://open.douyin.com/api/v2/video/upload/"
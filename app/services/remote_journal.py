@@ -0,0 +1,85 @@
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from app.services.video_gen_core import delete_video_generation_task
+from app.utils.hashing import params_hash
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE = "remote_tasks.json"
+
+_lock = threading.Lock()
+
+
+class RemoteJournal:
+    """
+    在途远程生成任务日志 tmp/<task_id>/remote_tasks.json
+    Ark 任务创建成功后立即记录 {场景键: 远程任务 ID, 输入摘要, 提交时间}，
+    进程重启或重试时据此重新挂接仍在生成的远程任务，而不是重新提交。
+    """
+
+    def __init__(self, task_dir: Path):
+        self.path = Path(task_dir) / JOURNAL_FILE
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (ValueError, OSError) as e:
+            logger.error(f"远程任务日志读取失败: {str(e)}")
+            return {}
+
+    def _save(self, entries: dict):
+        tmp_path = self.path.with_name(f"{JOURNAL_FILE}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, key: str) -> Optional[dict]:
+        with _lock:
+            return self._load().get(key)
+
+    def record(self, key: str, remote_id: str, inputs: Any):
+        """远程任务创建后立即落盘"""
+        with _lock:
+            entries = self._load()
+            entries[key] = {
+                "remote_id": remote_id,
+                "inputs": params_hash(inputs),
+                "submitted_at": time.time()
+            }
+            self._save(entries)
+
+    def finish(self, key: str, remote_id: str):
+        """结果已落地，移除记录"""
+        with _lock:
+            entries = self._load()
+            if entries.get(key, {}).get("remote_id") == remote_id:
+                del entries[key]
+                self._save(entries)
+
+    def matches(self, entry: dict, inputs: Any) -> bool:
+        return entry["inputs"] == params_hash(inputs)
+
+    def cleanup(self):
+        """删除日志中所有残留的远程任务（任务最终失败或被放弃时调用）"""
+        with _lock:
+            entries = self._load()
+        for key, entry in entries.items():
+            discard_remote_task(entry["remote_id"])
+            self.finish(key, entry["remote_id"])
+
+
+def discard_remote_task(remote_id: str):
+    """尽力删除远程任务，失败只记录日志"""
+    try:
+        delete_video_generation_task(remote_id)
+    except Exception as e:
+        logger.warning(f"清理远程任务 {remote_id} 失败: {str(e)}")
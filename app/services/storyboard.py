@@ -1,12 +1,28 @@
+import asyncio
 import json
+import logging
+import math
+import re
+from typing import AsyncIterator, List
+from app.config import settings
 from app.schemas import SceneScript
-from app.utils.api_clients import deepseek_request
+from app.utils import llm_cache
+from app.utils.api_clients import (
+    deepseek_request,
+    deepseek_request_async,
+    deepseek_stream_async,
+    forget_response
+)
+from app.utils.executors import run_io
+from app.utils.json_stream import JsonArrayStreamParser
 
+logger = logging.getLogger(__name__)
 
-def generate_scenes(content: str) -> list[SceneScript]:
-    prompt = f"""请将以下内容转换为3个视频分镜（JSON数组格式）：
-    {content}
 
+def _build_prompt(content: str, scene_count: int = 3, continuity: str = "") -> str:
+    return f"""请将以下内容转换为{scene_count}个视频分镜（JSON数组格式）：
+    {content}
+{continuity}
     每个分镜需要包含：
     - description: 画面描述（40字左右，具体包含场景、人物动作、镜头角度）
     - narration: 解说文案（15字左右，口语化表达）
@@ -17,8 +33,9 @@ def generate_scenes(content: str) -> list[SceneScript]:
         {{"description": "办公室内景，白领在电脑前皱眉查看数据", "narration": "据统计，超过60%的上班族表示工作压力主要来自..."}}
     ]"""
 
+
+def _parse_scenes(result: str) -> list[SceneScript]:
     try:
-        result = deepseek_request(prompt)
         # 处理可能的markdown代码块
         cleaned_result = result.replace("```json", "").replace("```", "").strip()
         scenes = json.loads(cleaned_result)
@@ -26,4 +43,162 @@ def generate_scenes(content: str) -> list[SceneScript]:
     except json.JSONDecodeError as e:
         raise ValueError(f"分镜解析失败：{str(e)}\n原始响应：{result}")
     except Exception as e:
-        raise ValueError("分镜生成失败：" + str(e))
\ No newline at end of file
+        raise ValueError("分镜生成失败：" + str(e))
+
+
+def generate_scenes(content: str) -> list[SceneScript]:
+    cached = llm_cache.get_stage("scenes", content)
+    if cached is not None:
+        return [SceneScript(**s) for s in cached]
+
+    prompt = _build_prompt(content)
+    try:
+        result = deepseek_request(prompt)
+    except Exception as e:
+        raise ValueError("分镜生成失败：" + str(e))
+    try:
+        scenes = _parse_scenes(result)
+    except ValueError:
+        # 无法解析的响应不保留在缓存中
+        forget_response(prompt)
+        raise
+
+    llm_cache.put_stage("scenes", content, [scene.dict() for scene in scenes])
+    return scenes
+
+
+async def generate_scenes_async(content: str) -> list[SceneScript]:
+    """generate_scenes 的异步版本"""
+    cached = await run_io(llm_cache.get_stage, "scenes", content)
+    if cached is not None:
+        return [SceneScript(**s) for s in cached]
+
+    prompt = _build_prompt(content)
+    try:
+        result = await deepseek_request_async(prompt)
+    except Exception as e:
+        raise ValueError("分镜生成失败：" + str(e))
+    try:
+        scenes = _parse_scenes(result)
+    except ValueError:
+        # 无法解析的响应不保留在缓存中
+        await run_io(forget_response, prompt)
+        raise
+
+    await run_io(llm_cache.put_stage, "scenes", content, [scene.dict() for scene in scenes])
+    return scenes
+
+
+async def stream_scenes_async(content: str) -> AsyncIterator[SceneScript]:
+    """
+    流式生成分镜：模型每写完一个分镜对象就立即产出，
+    调用方可以在模型仍在输出后续分镜时开始处理前面的场景
+    """
+    cached = await run_io(llm_cache.get_stage, "scenes", content)
+    if cached is not None:
+        for s in cached:
+            yield SceneScript(**s)
+        return
+
+    prompt = _build_prompt(content)
+    parser = JsonArrayStreamParser()
+    scenes = []
+    try:
+        async for delta in deepseek_stream_async(prompt):
+            for item in parser.feed(delta):
+                scene = SceneScript(**item)
+                scenes.append(scene)
+                yield scene
+    except ConnectionError as e:
+        raise ValueError("分镜生成失败：" + str(e))
+    except (ValueError, TypeError) as e:
+        await run_io(forget_response, prompt)
+        raise ValueError(f"分镜解析失败：{str(e)}")
+
+    if not scenes:
+        # 无法解析的响应不保留在缓存中
+        await run_io(forget_response, prompt)
+        raise ValueError("分镜解析失败：未解析到任何分镜")
+
+    await run_io(llm_cache.put_stage, "scenes", content, [scene.dict() for scene in scenes])
+
+
+def split_sections(content: str, section_count: int) -> List[str]:
+    """按句子边界把文案切成长度相近的若干段"""
+    sentences = [s for s in re.split(r"(?<=[。！？!?；;\n])", content) if s.strip()]
+    section_count = max(1, min(section_count, len(sentences)))
+    target_length = len(content) / section_count
+
+    sections, current = [], ""
+    for idx, sentence in enumerate(sentences):
+        current += sentence
+        remaining_sections = section_count - len(sections) - 1
+        remaining_sentences = len(sentences) - idx - 1
+        if remaining_sections > 0 and (len(current) >= target_length or remaining_sentences <= remaining_sections):
+            sections.append(current.strip())
+            current = ""
+    if current.strip():
+        sections.append(current.strip())
+    return sections
+
+
+def _continuity_hint(previous: str, following: str) -> str:
+    """相邻段落的衔接提示：各段并发生成，只能参考相邻段落的原文"""
+    hints = []
+    if previous:
+        hints.append(f"- 上一段内容结尾：“{previous[-60:]}”，第一个分镜的画面需与之自然衔接")
+    if following:
+        hints.append(f"- 下一段内容开头：“{following[:60]}”，最后一个分镜为其做好过渡")
+    if not hints:
+        return ""
+    hints.append("- 人物形象、画面风格与前后段落保持一致")
+    return "\n    这是长视频中的一段，衔接要求：\n    " + "\n    ".join(hints) + "\n"
+
+
+async def _generate_section_async(section: str, scene_count: int, continuity: str) -> list[SceneScript]:
+    """生成单个段落的分镜（结果按段落内容与衔接提示缓存）"""
+    stage_inputs = {"section": section, "scene_count": scene_count, "continuity": continuity}
+    cached = await run_io(llm_cache.get_stage, "scenes_section", stage_inputs)
+    if cached is not None:
+        return [SceneScript(**s) for s in cached]
+
+    prompt = _build_prompt(section, scene_count, continuity)
+    max_tokens = max(2000, scene_count * settings.STORYBOARD_TOKENS_PER_SCENE)
+    try:
+        result = await deepseek_request_async(prompt, max_tokens)
+    except Exception as e:
+        raise ValueError("分镜生成失败：" + str(e))
+    try:
+        scenes = _parse_scenes(result)
+    except ValueError:
+        await run_io(forget_response, prompt, max_tokens)
+        raise
+
+    await run_io(llm_cache.put_stage, "scenes_section", stage_inputs, [scene.dict() for scene in scenes])
+    return scenes
+
+
+async def generate_long_form_scenes_async(content: str, target_scenes: int) -> list[SceneScript]:
+    """
+    长视频分镜：文案切分为若干段，各段分镜并发生成后按顺序拼接，
+    分镜生成耗时约等于单段耗时，不随目标场景数线性增长
+    :param content: 处理后的文案
+    :param target_scenes: 目标场景总数
+    :return: 按顺序排列的分镜列表
+    """
+    sections = split_sections(content, math.ceil(target_scenes / settings.STORYBOARD_SCENES_PER_SECTION))
+    # 目标场景数按段落长度比例分配，每段至少 1 个
+    total_length = sum(len(section) for section in sections)
+    counts = [max(1, round(target_scenes * len(section) / total_length)) for section in sections]
+    logger.info(f"长视频分镜：{len(sections)} 段，目标 {target_scenes} 个场景，各段 {counts}")
+
+    semaphore = asyncio.Semaphore(settings.STORYBOARD_CONCURRENCY)
+
+    async def generate(idx: int) -> list[SceneScript]:
+        previous = sections[idx - 1] if idx > 0 else ""
+        following = sections[idx + 1] if idx + 1 < len(sections) else ""
+        async with semaphore:
+            return await _generate_section_async(sections[idx], counts[idx], _continuity_hint(previous, following))
+
+    results = await asyncio.gather(*[generate(idx) for idx in range(len(sections))])
+    return [scene for section_scenes in results for scene in section_scenes]
@@ -1,22 +1,50 @@
+import asyncio
 import base64
+import json
 import logging
-import time
+import operator
+import os
 import uuid
+from functools import partial
 from pathlib import Path
-from typing import List
+from typing import Awaitable, Callable, List, Optional
 
 import requests
-from moviepy.editor import concatenate_videoclips, ImageClip
-from moviepy.editor import VideoFileClip, AudioFileClip
 
 from app.config import settings
+from app.services.ark_poller import get_poller
 from app.services.video_gen_core import (
     encode_image_to_base64,
-    create_video_generation_task,
-    get_video_generation_task,
+    create_video_generation_task_async,
     download_video,
-    delete_video_generation_task
+    delete_video_generation_task_async
 )
+from app.services import artifact_cache
+from app.services.manifest import TaskManifest, stage_inputs
+from app.services.remote_journal import RemoteJournal, discard_remote_task
+from app.utils import encode_scheduler
+from app.utils.downloader import get_session
+from app.utils.executors import run_io
+from app.utils.ffmpeg import (
+    KEN_BURNS_MOTIONS,
+    FFmpegError,
+    concat_copy,
+    cut_audio,
+    encode_profile,
+    extract_last_frame,
+    probe_duration,
+    render_ken_burns,
+    render_scene,
+    scale_pad_filter,
+    video_encoder_args
+)
+from app.utils.hashing import file_sha256
+from app.utils.hedging import hedged, lost, shielded
+from app.utils.latency import get_tracker
+from app.utils import tracing
+from app.utils.metrics import track_call
+from app.utils.mp3_info import mp3_duration
+from app.utils.task_graph import TaskGraph
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -33,114 +61,350 @@ class TTSGenerationError(Exception):
     pass
 
 
-def generate_videos(scenes: List[dict], image_paths: List[str], task_dir: Path) -> List[Path]:
+async def generate_videos(scenes: List[dict], image_paths: List[str], task_dir: Path,
+                          resume: bool = False, engine: Optional[str] = None) -> List[Path]:
     """
-    生成视频主流程
+    生成视频主流程：每个场景的 视频生成 / 语音生成 并行执行，完成后各自合并
     :param scenes: 场景描述列表
     :param image_paths: 对应图片路径列表
     :param task_dir: 任务输出目录
+    :param resume: 是否复用清单中已完成的阶段产物
+    :param engine: 视频引擎 ark / local / auto，默认取 VIDEO_ENGINE 配置
     :return: 生成的视频路径列表
     """
-    video_paths = []
-
+    engine = engine or settings.VIDEO_ENGINE
+    manifest = TaskManifest(task_dir, resume=resume)
+    graph = TaskGraph(settings.PIPELINE_MAX_CONCURRENCY)
+    tts_batch_node = add_tts_batch_node(graph, scenes, task_dir, manifest)
+    merge_nodes = []
     for idx, (scene, image_path) in enumerate(zip(scenes, image_paths)):
-        logger.info(f"正在处理第 {idx + 1}/{len(scenes)} 个场景...")
-        retries = 0
-        MAX_RETRIES = settings.MAX_RETRIES
+        image_node = graph.add(f"image_{idx}", partial(Path, image_path))
+        merge_nodes.append(
+            add_scene_nodes(graph, scene, idx, task_dir, image_node, manifest, tts_batch_node=tts_batch_node,
+                            engine=engine)
+        )
 
-        while retries < MAX_RETRIES:
-            try:
-                # 生成视频
-                raw_video_path = _generate_single_video(
-                    image_path=image_path,
-                    text_prompt=scene["narration"],
-                    task_dir=task_dir,
-                    index=idx
-                )
+    results = await graph.run()
+    return [results[name] for name in merge_nodes]
 
-                # 生成语音
-                audio_path = _generate_tts(
-                    text=scene["narration"],
-                    task_dir=task_dir,
-                    idx=idx
-                )
 
-                # 合并音视频
-                merged_path = _merge_audio_video(
-                    video_path=raw_video_path,
-                    audio_path=audio_path,
-                    task_dir=task_dir,
-                    index=idx
-                )
+def add_scene_nodes(graph: TaskGraph, scene: dict, idx: int, task_dir: Path, image_node: str,
+                    manifest: Optional[TaskManifest] = None, narration_first: bool = False,
+                    tts_batch_node: Optional[str] = None, engine: str = "ark") -> str:
+    """
+    向任务图中添加单个场景的 视频 -> 合并 链路，语音生成与之并行
+    :param graph: 任务图
+    :param scene: 场景描述
+    :param idx: 场景索引
+    :param task_dir: 任务输出目录
+    :param image_node: 产出图片路径的节点名称
+    :param manifest: 任务清单，传入时各阶段带检查点
+    :param narration_first: 先合成语音，按解说时长决定视频生成时长
+    :param tts_batch_node: 批量语音节点名称，传入时从其结果中取本场景音频
+    :param engine: 视频引擎 ark / local / auto
+    :return: 合并节点名称
+    """
+    narration = scene["narration"]
+
+    def checkpoint(stage, func, params=None):
+        return manifest.wrap(stage, func, params) if manifest is not None else func
+
+    if tts_batch_node is not None:
+        tts_node = graph.add(f"tts_{idx}", operator.itemgetter(idx), deps=[tts_batch_node])
+    else:
+        tts_node = graph.add(
+            f"tts_{idx}",
+            checkpoint(
+                f"tts_{idx}",
+                partial(_generate_tts, narration, task_dir, idx),
+                _tts_params(narration)
+            ),
+            retries=settings.MAX_RETRIES
+        )
 
-                video_paths.append(merged_path)
-                break
+    video_params = {"narration": narration, "model": settings.VIDEO_GENERATION_MODEL_EP, "engine": engine}
+    if narration_first:
+        # 视频依赖语音：时长由解说音频决定
+        video_params["durations"] = settings.ARK_CLIP_DURATIONS
+        video_node = graph.add(
+            f"video_{idx}",
+            checkpoint(
+                f"video_{idx}",
+                partial(_generate_narrated_video, text_prompt=narration, task_dir=task_dir, index=idx,
+                        engine=engine),
+                video_params
+            ),
+            deps=[image_node, tts_node],
+            retries=settings.MAX_RETRIES
+        )
+    else:
+        video_node = graph.add(
+            f"video_{idx}",
+            checkpoint(
+                f"video_{idx}",
+                partial(_generate_scene_video, text_prompt=narration, task_dir=task_dir, index=idx,
+                        engine=engine),
+                video_params
+            ),
+            deps=[image_node],
+            retries=settings.MAX_RETRIES
+        )
 
-            except VideoGenerationError as e:
-                logger.error(f"视频生成失败: {str(e)}")
-                retries += 1
-                if retries >= MAX_RETRIES:
-                    raise RuntimeError(f"场景 {idx} 视频生成达到最大重试次数")
+    # 编码由本机编码调度器提交到 CPU 进程池
+    return graph.add(
+        f"merge_{idx}",
+        checkpoint(
+            f"merge_{idx}",
+            partial(encode_scheduler.submit, _merge_audio_video, task_dir=task_dir, index=idx),
+            {"profile": encode_profile()}
+        ),
+        deps=[video_node, tts_node],
+        retries=settings.MAX_RETRIES
+    )
 
-            except TTSGenerationError as e:
-                logger.error(f"语音生成失败: {str(e)}")
-                retries += 1
-                if retries >= MAX_RETRIES:
-                    raise RuntimeError(f"场景 {idx} 语音生成达到最大重试次数")
 
-            except Exception as e:
-                logger.error(f"未知错误: {str(e)}")
-                retries += 1
-                if retries >= MAX_RETRIES:
-                    raise RuntimeError(f"场景 {idx} 处理失败")
+def add_tts_batch_node(graph: TaskGraph, scenes: List[dict], task_dir: Path,
+                       manifest: Optional[TaskManifest] = None) -> Optional[str]:
+    """
+    开启批量语音且场景不止一个时加入批量语音节点，返回节点名称
+    各场景音频仍以 tts_N 记入清单，续跑时只批量合成检查点无效的场景
+    """
+    if not settings.TTS_BATCH or len(scenes) < 2:
+        return None
+    narrations = [scene["narration"] for scene in scenes]
+    return graph.add(
+        "tts_batch", partial(generate_tts_batch, narrations, task_dir, manifest), retries=settings.MAX_RETRIES
+    )
 
-    return video_paths
 
+def _tts_params(narration: str) -> dict:
+    """tts_N 检查点的固定参数（逐场景与批量合成共用）"""
+    return {"narration": narration, "voice_type": settings.TTS_VOICE_TYPE}
 
-def _generate_single_video(image_path: str, text_prompt: str, task_dir: Path, index: int) -> Path:
-    """生成单个视频片段"""
-    # try:
+
+def plan_clip_durations(narration_duration: float) -> List[int]:
+    """
+    按解说时长选择 Ark 生成时长：能被单个片段覆盖时取不短于解说的最短时长，
+    否则串联多个最长片段，末段取能覆盖剩余时长的最短时长
+    """
+    durations = sorted(settings.ARK_CLIP_DURATIONS)
+    plan = []
+    remaining = narration_duration
+    while remaining > durations[-1]:
+        plan.append(durations[-1])
+        remaining -= durations[-1]
+    plan.append(next(d for d in durations if d >= remaining))
+    return plan
+
+
+def resolve_engine(engine: str) -> str:
+    """auto 模式下 Ark 近期耗时的 P90 超过阈值时直接改用本地引擎"""
+    if engine != "auto":
+        return engine
+    p90 = get_tracker("ark_video").percentile(90)
+    if p90 is not None and p90 > settings.LOCAL_ENGINE_LATENCY_THRESHOLD:
+        logger.info(f"Ark 近期耗时 P90 {p90:.0f} 秒超过阈值，使用本地引擎")
+        return "local"
+    return engine
+
+
+async def _with_engine(engine: str, index: int, ark: Callable[[], Awaitable[Path]],
+                       local: Callable[[], Awaitable[Path]]) -> Path:
+    """
+    按引擎生成视频；auto 模式下 Ark 任何失败（超时、生成失败、SDK 报错、配额、下载失败等）
+    都改用本地引擎，保证任务在限定时间内完成。取消（CancelledError）不属于 Exception，照常向上抛出
+    """
+    engine = resolve_engine(engine)
+    if engine == "local":
+        return await local()
+    try:
+        return await ark()
+    except Exception as e:
+        if engine != "auto":
+            raise
+        logger.warning(f"第 {index} 个场景 Ark 生成失败，改用本地引擎: {str(e)}")
+        return await local()
+
+
+async def _generate_scene_video(image_path: str, text_prompt: str, task_dir: Path, index: int,
+                                engine: str = "ark") -> Path:
+    """生成场景视频（默认时长）"""
+    return await _with_engine(
+        engine, index,
+        lambda: _generate_single_video(image_path, text_prompt, task_dir, index),
+        lambda: _generate_local_video(image_path, task_dir, index, settings.LOCAL_CLIP_DURATION)
+    )
+
+
+async def _generate_local_video(image_path: str, task_dir: Path, index: int, duration: float) -> Path:
+    """本地引擎：静态图片运镜生成视频片段（不调用远程服务，可完全离线运行）"""
+    profile = encode_profile()
+    motion = KEN_BURNS_MOTIONS[index % len(KEN_BURNS_MOTIONS)]
+    raw_video_path = task_dir / f"raw_video_{index}.mp4"
+    cache_params = {
+        "image_sha256": await run_io(file_sha256, image_path),
+        "duration": round(duration, 3),
+        "motion": motion,
+        "profile": profile
+    }
+    logger.info(f"本地生成第 {index} 个视频片段（{motion}，{duration:.1f} 秒）...")
+    return await artifact_cache.cached_async(
+        "local_video", cache_params, raw_video_path,
+        lambda: encode_scheduler.submit(render_ken_burns, image_path, raw_video_path, duration, motion, profile)
+    )
+
+
+async def _generate_narrated_video(image_path: str, audio_path: Path, text_prompt: str, task_dir: Path,
+                                   index: int, engine: str = "ark") -> Path:
+    """
+    按解说时长生成视频：时长写入提示词（--dur），超过单片段上限时以上一片段的末帧为首帧串联生成，
+    各片段流拷贝拼接，合并时几乎不再需要裁剪或补帧
+    """
+    try:
+        narration_duration = await run_io(mp3_duration, audio_path)
+    except (ValueError, OSError) as e:
+        logger.warning(f"MP3 帧头解析失败，改用 ffmpeg 读取时长: {str(e)}")
+        narration_duration = await run_io(probe_duration, audio_path)
+
+    return await _with_engine(
+        engine, index,
+        lambda: _generate_ark_clips(image_path, text_prompt, task_dir, index, narration_duration),
+        lambda: _generate_local_video(image_path, task_dir, index, narration_duration)
+    )
+
+
+async def _generate_ark_clips(image_path: str, text_prompt: str, task_dir: Path, index: int,
+                              narration_duration: float) -> Path:
+    """按解说时长规划 Ark 片段并串联生成"""
+    plan = plan_clip_durations(narration_duration)
+    logger.info(f"第 {index} 个场景解说 {narration_duration:.1f} 秒，生成片段 {plan}")
+
+    clips = []
+    first_frame = image_path
+    for part, duration in enumerate(plan):
+        clip = await _generate_single_video(
+            first_frame, f"{text_prompt} --dur {duration}", task_dir, index,
+            part=part if len(plan) > 1 else None
+        )
+        clips.append(clip)
+        if part + 1 < len(plan):
+            frame_path = task_dir / f"raw_video_{index}_{part}_last.jpg"
+            first_frame = str(await run_io(extract_last_frame, clip, frame_path))
+
+    if len(clips) == 1:
+        return clips[0]
+    return await run_io(concat_copy, clips, task_dir / f"raw_video_{index}.mp4")
+
+
+async def _generate_single_video(image_path: str, text_prompt: str, task_dir: Path, index: int,
+                                part: Optional[int] = None) -> Path:
+    """生成单个视频片段（相同图片、提示词与模型接入点命中产物缓存）"""
     # 校验图片文件
     if not Path(image_path).exists():
         raise FileNotFoundError(f"图片文件 {image_path} 不存在")
 
-    # 编码图片
-    logger.info(f"正在编码第 {index} 张图片...")
-    image_base64 = encode_image_to_base64(image_path)
-
-    # 创建生成任务
-    logger.info(f"创建第 {index} 个视频生成任务...")
-    create_result = create_video_generation_task(
-        model_id=settings.VIDEO_GENERATION_MODEL_EP,
-        text_prompt=text_prompt,
-        image_base64=image_base64
+    suffix = f"{index}" if part is None else f"{index}_{part}"
+    raw_video_path = task_dir / f"raw_video_{suffix}.mp4"
+    cache_params = {
+        "image_sha256": await run_io(file_sha256, image_path),
+        "prompt": text_prompt,
+        "model": settings.VIDEO_GENERATION_MODEL_EP
+    }
+    return await artifact_cache.cached_async(
+        "video", cache_params, raw_video_path,
+        lambda: _request_video(image_path, text_prompt, raw_video_path, suffix, cache_params)
     )
 
-    # 轮询任务状态
-    logger.info(f"开始轮询任务状态 [{create_result.id}]...")
-    start_time = time.time()
-    while True:
-        if time.time() - start_time > settings.VIDEO_GENERATION_TIMEOUT:
-            delete_video_generation_task(create_result.id)
-            raise TimeoutError("视频生成超时")
 
-        task_info = get_video_generation_task(create_result.id)
+async def _discard_created(create_result):
+    """对冲落败时创建请求才返回：直接删除新建的远端任务"""
+    await run_io(discard_remote_task, create_result.id)
 
-        if task_info.status == 'succeeded':
-            logger.info(f"任务 {create_result.id} 成功完成")
-            break
-        if task_info.status == 'failed':
-            delete_video_generation_task(create_result.id)
-            raise VideoGenerationError(f"视频生成失败: {task_info.error}")
 
-        logger.debug(f"任务状态: {task_info.status}, 等待 {settings.POLLING_INTERVAL} 秒后重试...")
-        time.sleep(settings.POLLING_INTERVAL)
+async def _request_video(image_path: str, text_prompt: str, raw_video_path: Path, index: str,
+                         inputs: dict) -> Path:
+    """
+    调用 Ark 生成视频并下载（异步轮询，等待期间不占用线程）
+    远程任务创建后立即写入日志；重试或进程重启后优先重新挂接日志中仍有效的远程任务
+    """
+    # try:
+    journal = RemoteJournal(raw_video_path.parent)
+    journal_key = f"video_{index}"
+
+    task_info = None
+    finish_key = journal_key
+    entry = await run_io(journal.lookup, journal_key)
+    if entry is not None:
+        remote_id = entry["remote_id"]
+        if journal.matches(entry, inputs):
+            logger.info(f"重新挂接第 {index} 个视频的远程任务 [{remote_id}]...")
+            try:
+                with tracing.span("ark.wait", "wait", remote_id=remote_id, reattached=True):
+                    task_info = await get_poller().wait(remote_id, entry["submitted_at"])
+            except Exception as e:
+                logger.warning(f"远程任务 {remote_id} 无法恢复，重新提交: {str(e)}")
+            if task_info is None or task_info.status != 'succeeded':
+                await run_io(discard_remote_task, remote_id)
+                task_info = None
+        else:
+            # 输入已变化（如分镜被重新生成），旧任务的结果不再需要
+            await run_io(discard_remote_task, remote_id)
+
+    if task_info is None:
+        # 编码图片
+        logger.info(f"正在编码第 {index} 张图片...")
+        image_base64 = await run_io(encode_image_to_base64, image_path)
+
+        async def attempt(n: int):
+            # 对冲请求使用各自的日志键，任务结束时未认领的条目由 cleanup 统一删除
+            key = journal_key if n == 0 else f"{journal_key}_hedge{n}"
+            logger.info(f"创建第 {index} 个视频生成任务...")
+            create_result = await shielded(
+                create_video_generation_task_async(
+                    model_id=settings.VIDEO_GENERATION_MODEL_EP,
+                    text_prompt=text_prompt,
+                    image_base64=image_base64
+                ),
+                _discard_created
+            )
+            remote_id = create_result.id
+            try:
+                await run_io(journal.record, key, remote_id, inputs)
+
+                # 由集中轮询器跟踪任务状态，等待期间不占用线程也不单独发起查询
+                logger.info(f"等待任务完成 [{remote_id}]...")
+                with tracing.span("ark.wait", "wait", remote_id=remote_id, attempt=n):
+                    task_info = await get_poller().wait(remote_id)
+            except asyncio.CancelledError as e:
+                # 对冲落败：删除仍在生成的远端任务，不再为其付费；整体被取消时保留日志以便重新挂接
+                if lost(e):
+                    await _discard_attempt((key, remote_id, None))
+                raise
+            except TimeoutError:
+                # 轮询器超时时已删除远端任务，移除日志条目，避免重试时徒劳地重新挂接
+                await run_io(journal.finish, key, remote_id)
+                raise
+
+            if task_info.status != 'succeeded':
+                await delete_video_generation_task_async(remote_id)
+                await run_io(journal.finish, key, remote_id)
+                raise VideoGenerationError(f"视频生成失败: {task_info.status} {task_info.error}")
+            return key, remote_id, task_info
+
+        async def _discard_attempt(result):
+            key, loser_id, _ = result
+            await run_io(discard_remote_task, loser_id)
+            await run_io(journal.finish, key, loser_id)
+
+        # 生成耗时已由轮询器记录
+        finish_key, remote_id, task_info = await hedged("ark_video", attempt, discard=_discard_attempt, record=False)
+    logger.info(f"任务 {remote_id} 成功完成")
 
     # 下载视频
     video_url = task_info.content.video_url
-    raw_video_path = task_dir / f"raw_video_{index}.mp4"
     logger.info(f"正在下载视频到 {raw_video_path}...")
-    download_video(video_url, raw_video_path)
+    await run_io(download_video, video_url, raw_video_path)
+    await run_io(journal.finish, finish_key, remote_id)
 
     return raw_video_path
 
@@ -149,71 +413,91 @@ def _generate_single_video(image_path: str, text_prompt: str, task_dir: Path, in
     #     raise VideoGenerationError(str(e))
 
 
+def _audio_params() -> dict:
+    return {
+        "voice_type": settings.TTS_VOICE_TYPE,
+        "encoding": "mp3",
+        "speed_ratio": 1.0,
+    }
+
+
 def _generate_tts(text: str, task_dir: Path, idx: int) -> Path:
     """
-    生成TTS语音文件
+    生成TTS语音文件（相同文本、音色与语速命中产物缓存）
     :param text: 需要合成的文本
     :param task_dir: 输出目录
     :param idx: 场景索引
     :return: 生成的音频文件路径
     """
-    try:
-        logger.info(f"正在生成第 {idx} 段语音...")
+    audio_params = _audio_params()
+    audio_path = task_dir / f"audio_{idx}.mp3"
+    return artifact_cache.cached(
+        "tts", {"text": text, **audio_params}, audio_path,
+        lambda: _synthesize_tts(text, audio_params, audio_path, idx)
+    )
 
-        # 生成唯一请求ID
-        reqid = str(uuid.uuid4())
-
-        # 构建请求数据
-        data = {
-            "app": {
-                "appid": settings.APPID,
-                "token": settings.ACCESS_TOKEN,
-                "cluster": "volcano_tts",
-            },
-            "user": {
-                "uid": f"user_{idx}"  # 唯一用户标识
-            },
-            "audio": {
-                "voice_type": settings.TTS_VOICE_TYPE,
-                "encoding": "mp3",
-                "speed_ratio": 1.0,
-            },
-            "request": {
-                "reqid": reqid,
-                "text": text,
-                "operation": "query",
-            }
-        }
 
-        # 设置请求头
-        headers = {
-            "Authorization": f"Bearer;{settings.ACCESS_TOKEN}",
-            "Content-Type": "application/json",
-            "X-Request-ID": reqid
+def _tts_request(text: str, audio_params: dict, uid: str, extra: Optional[dict] = None) -> dict:
+    """发送一次 TTS 请求（复用共享会话的连接），返回响应数据"""
+    # 生成唯一请求ID
+    reqid = str(uuid.uuid4())
+
+    # 构建请求数据
+    data = {
+        "app": {
+            "appid": settings.APPID,
+            "token": settings.ACCESS_TOKEN,
+            "cluster": "volcano_tts",
+        },
+        "user": {
+            "uid": uid  # 唯一用户标识
+        },
+        "audio": audio_params,
+        "request": {
+            "reqid": reqid,
+            "text": text,
+            "operation": "query",
+            **(extra or {})
         }
-
-        # 发送请求
-        response = requests.post(
+    }
+
+    # 设置请求头
+    headers = {
+        "Authorization": f"Bearer;{settings.ACCESS_TOKEN}",
+        "Content-Type": "application/json",
+        "X-Request-ID": reqid
+    }
+
+    # 发送请求
+    with track_call("volcano_tts", "synthesize"):
+        response = get_session().post(
             settings.TTS_API_ENDPOINT,
             headers=headers,
             json=data,
             timeout=settings.TTS_TIMEOUT
         )
 
-        # 处理响应
-        if response.status_code != 200:
-            raise TTSGenerationError(f"API请求失败，状态码: {response.status_code}")
+    # 处理响应
+    if response.status_code != 200:
+        raise TTSGenerationError(f"API请求失败，状态码: {response.status_code}")
 
-        response_data = response.json()
-        if response_data.get("code") != 3000:
-            raise TTSGenerationError(
-                f"TTS生成失败，错误码: {response_data.get('code', 'unknown')}, "
-                f"错误信息: {response_data.get('message', '无错误信息')}"
-            )
+    response_data = response.json()
+    if response_data.get("code") != 3000:
+        raise TTSGenerationError(
+            f"TTS生成失败，错误码: {response_data.get('code', 'unknown')}, "
+            f"错误信息: {response_data.get('message', '无错误信息')}"
+        )
+    return response_data
+
+
+def _synthesize_tts(text: str, audio_params: dict, audio_path: Path, idx: int) -> Path:
+    """调用 TTS 接口合成语音"""
+    try:
+        logger.info(f"正在生成第 {idx} 段语音...")
+        response_data = _tts_request(text, audio_params, f"user_{idx}")
 
         # 解码并保存音频
         audio_data = base64.b64decode(response_data["data"])
-        audio_path = task_dir / f"audio_{idx}.mp3"
 
         with open(audio_path, "wb") as f:
             f.write(audio_data)
@@ -221,6 +505,8 @@ def _generate_tts(text: str, task_dir: Path, idx: int) -> Path:
         logger.info(f"语音文件已保存到 {audio_path}")
         return audio_path
 
+    except TTSGenerationError:
+        raise
     except requests.exceptions.RequestException as e:
         raise TTSGenerationError(f"网络请求失败: {str(e)}")
     except KeyError as e:
@@ -229,11 +515,152 @@ def _generate_tts(text: str, task_dir: Path, idx: int) -> Path:
         raise TTSGenerationError(f"未知错误: {str(e)}")
 
 
-def _merge_audio_video(video_path: Path, audio_path: Path, task_dir: Path, index: int) -> Path:
-    """合并音视频"""
+async def generate_tts_batch(narrations: List[str], task_dir: Path,
+                             manifest: Optional[TaskManifest] = None) -> List[Path]:
+    """
+    批量生成各场景语音：清单检查点有效的场景直接复用，其余未命中缓存的解说合并为一次请求，
+    按返回的字级时间戳切分为 audio_N.mp3；批量合成或切分失败时退回逐场景并行请求
+    :param narrations: 各场景解说文案
+    :param task_dir: 输出目录
+    :param manifest: 任务清单，传入时各场景音频以 tts_N 记录检查点
+    :return: 各场景音频路径
+    """
+    audio_params = _audio_params()
+    audio_paths = [task_dir / f"audio_{idx}.mp3" for idx in range(len(narrations))]
+    inputs = [stage_inputs(_tts_params(text)) for text in narrations]
+
+    pending = []
+    for idx in range(len(narrations)):
+        cached = await run_io(manifest.valid_output, f"tts_{idx}", inputs[idx]) if manifest else None
+        if cached is not None:
+            logger.info(f"阶段 tts_{idx} 已完成，复用 {cached}")
+            audio_paths[idx] = cached
+        else:
+            pending.append(idx)
+
+    missing = []
+    for idx in pending:
+        if not await run_io(artifact_cache.fetch, "tts", {"text": narrations[idx], **audio_params}, audio_paths[idx]):
+            missing.append(idx)
+
+    async def synthesize_group(group: List[int]):
+        if len(group) > 1:
+            try:
+                await run_io(
+                    _synthesize_tts_batch,
+                    [narrations[idx] for idx in group], [audio_paths[idx] for idx in group],
+                    audio_params, task_dir, group[0]
+                )
+                for idx in group:
+                    await run_io(artifact_cache.store, "tts", {"text": narrations[idx], **audio_params},
+                                 audio_paths[idx])
+                return
+            except (TTSGenerationError, FFmpegError) as e:
+                logger.warning(f"批量语音合成失败，改为逐场景合成: {str(e)}")
+        await asyncio.gather(*[run_io(_generate_tts, narrations[idx], task_dir, idx) for idx in group])
+
+    # 单次请求的文本长度有上限，超出时分成多批并行请求
+    groups, current, current_bytes = [], [], 0
+    for idx in missing:
+        size = len(narrations[idx].encode("utf-8")) + 3
+        if current and current_bytes + size > settings.TTS_BATCH_MAX_BYTES:
+            groups.append(current)
+            current, current_bytes = [], 0
+        current.append(idx)
+        current_bytes += size
+    if current:
+        groups.append(current)
+
+    await asyncio.gather(*[synthesize_group(group) for group in groups])
+    if manifest is not None:
+        for idx in pending:
+            await run_io(manifest.record, f"tts_{idx}", audio_paths[idx], inputs[idx])
+    return audio_paths
+
+
+_PUNCTUATION = set("，。！？；：、,.!?;:\"'“”‘’（）()《》…—- \t\n")
+
+
+def _spoken_length(text: str) -> int:
+    """朗读的字数（不含标点与空白），用于把字级时间戳对应回各段文本"""
+    return sum(1 for ch in text if ch not in _PUNCTUATION)
+
+
+def _synthesize_tts_batch(texts: List[str], audio_paths: List[Path], audio_params: dict, task_dir: Path,
+                          batch_id: int):
+    """一次请求合成多段解说，并在段落边界处切分音频"""
+    logger.info(f"正在批量生成 {len(texts)} 段语音...")
+    # 每段以句号结尾，保证段落之间有停顿
+    joined = "".join(text if text[-1:] in _PUNCTUATION else text + "。" for text in texts)
+    try:
+        response_data = _tts_request(
+            joined, audio_params, "user_batch",
+            {"with_frontend": 1, "frontend_type": "unitTson"}
+        )
+        words = json.loads(response_data["addition"]["frontend"])["words"]
+        batch_path = task_dir / f"audio_batch_{batch_id}.mp3"
+        with open(batch_path, "wb") as f:
+            f.write(base64.b64decode(response_data["data"]))
+    except TTSGenerationError:
+        raise
+    except requests.exceptions.RequestException as e:
+        raise TTSGenerationError(f"网络请求失败: {str(e)}")
+    except (KeyError, TypeError, ValueError) as e:
+        raise TTSGenerationError(f"响应缺少时间戳: {str(e)}")
+
+    # 时间戳单位：秒（部分音色返回毫秒）
+    scale = 0.001 if words and words[-1]["end_time"] > 1000 else 1.0
+
+    # 按各段朗读字数在字级时间戳中找到段落边界，边界取两段之间停顿的中点
+    boundaries = []
+    spoken, target = 0, 0
+    segment_ends = []
+    for text in texts:
+        target += _spoken_length(text)
+        segment_ends.append(target)
+    segment = 0
+    for pos, word in enumerate(words):
+        spoken += _spoken_length(word["word"])
+        if segment < len(texts) - 1 and spoken == segment_ends[segment] and pos + 1 < len(words):
+            boundaries.append((word["end_time"] + words[pos + 1]["start_time"]) / 2 * scale)
+            segment += 1
+        elif segment < len(texts) - 1 and spoken > segment_ends[segment]:
+            break
+    if len(boundaries) != len(texts) - 1 or spoken != segment_ends[-1]:
+        raise TTSGenerationError("字级时间戳与文本无法对齐")
+
+    starts = [0.0] + boundaries
+    ends = boundaries + [None]
+    try:
+        for audio_path, start, end in zip(audio_paths, starts, ends):
+            cut_audio(batch_path, audio_path, start, end)
+    finally:
+        os.remove(batch_path)
+    logger.info(f"批量语音已切分为 {len(texts)} 段")
+
+
+def _merge_audio_video(video_path: Path, audio_path: Path, task_dir: Path, index: int, threads: int = 4) -> Path:
+    """合并音视频：默认由 ffmpeg 单次滤镜图完成，不可用或失败时退回 moviepy"""
+    output_path = task_dir / f"merged_{index}.mp4"
+    if settings.RENDER_BACKEND == "ffmpeg":
+        try:
+            logger.info(f"开始合并第 {index} 个音视频（ffmpeg）...")
+            render_scene(video_path, audio_path, output_path, encode_profile(), threads)
+            logger.info(f"合并完成: {output_path}")
+            return output_path
+        except FFmpegError as e:
+            logger.warning(f"ffmpeg 渲染失败，改用 moviepy: {str(e)}")
+    return _merge_audio_video_moviepy(video_path, audio_path, output_path, index, threads)
+
+
+def _merge_audio_video_moviepy(video_path: Path, audio_path: Path, output_path: Path, index: int,
+                               threads: int) -> Path:
+    """合并音视频（moviepy 逐帧处理）"""
+    # moviepy.editor 导入较慢（探测 ffmpeg 等），只在编码进程中按需导入
+    from moviepy.editor import AudioFileClip, ImageClip, VideoFileClip, concatenate_videoclips
+
     try:
         logger.info(f"开始合并第 {index} 个音视频...")
-        output_path = task_dir / f"merged_{index}.mp4"
 
         # 加载视频和音频
         video = VideoFileClip(str(video_path))
@@ -252,12 +679,16 @@ def _merge_audio_video(video_path: Path, audio_path: Path, task_dir: Path, index
         # 设置音频
         final_clip = video.set_audio(audio)
 
-        # 输出设置
+        # 输出设置：统一分辨率、帧率、关键帧间隔与采样率，成片可直接流拷贝拼接
+        profile = encode_profile()
         final_clip.write_videofile(
             str(output_path),
-            codec="libx264",
-            audio_codec="aac",
-            threads=4,
+            fps=profile["fps"],
+            codec=profile["video_codec"],
+            audio_codec=profile["audio_codec"],
+            audio_fps=profile["audio_rate"],
+            ffmpeg_params=["-vf", scale_pad_filter(profile), *video_encoder_args(profile)],
+            threads=threads,
             verbose=False,
             logger=None  # 禁用 moviepy 日志
         )
@@ -278,32 +709,82 @@ def _merge_audio_video(video_path: Path, audio_path: Path, task_dir: Path, index
             final_clip.close()
 
 
-def combine_videos(video_paths: List[Path], task_dir: Path) -> Path:
-    """合并所有视频片段"""
+def combine_videos(video_paths: List[Path], task_dir: Path, threads: int = 4) -> Path:
+    """合并所有视频片段：优先流拷贝拼接，失败时解码后重新编码"""
+    output_path = task_dir / "final_output.mp4"
+    if settings.STREAM_COPY_CONCAT:
+        try:
+            logger.info("开始流拷贝拼接最终视频...")
+            concat_copy(video_paths, output_path)
+            logger.info(f"最终视频已生成: {output_path}")
+            return output_path
+        except FFmpegError as e:
+            logger.warning(f"流拷贝拼接失败，改为重新编码: {str(e)}")
+    return _combine_videos_reencode(video_paths, output_path, threads)
+
+
+def _combine_videos_reencode(video_paths: List[Path], output_path: Path, threads: int) -> Path:
+    """
+    解码后重新编码拼接（片段编码参数不一致时使用）
+    分层合并：每次最多同时打开 CONCAT_WINDOW 个片段，片段更多时先逐组拼成中间片段再逐层合并，
+    打开的读取进程数与内存占用不随场景数增长
+    """
+    window = max(2, settings.CONCAT_WINDOW)
+    paths = list(video_paths)
+    intermediates = []
     try:
+        level = 0
+        while len(paths) > window:
+            logger.info(f"第 {level} 层分组拼接 {len(paths)} 个片段...")
+            next_paths = []
+            for start in range(0, len(paths), window):
+                group = paths[start:start + window]
+                if len(group) == 1:
+                    next_paths.append(group[0])
+                    continue
+                segment_path = output_path.with_name(f"{output_path.stem}.L{level}_{start // window}.mp4")
+                _concat_window(group, segment_path, threads)
+                intermediates.append(segment_path)
+                next_paths.append(segment_path)
+            paths = next_paths
+            level += 1
+
         logger.info("开始合并最终视频...")
-        clips = []
+        _concat_window(paths, output_path, threads)
+        logger.info(f"最终视频已生成: {output_path}")
+        return output_path
+    finally:
+        for segment_path in intermediates:
+            segment_path.unlink(missing_ok=True)
+
+
+def _concat_window(video_paths: List[Path], output_path: Path, threads: int) -> Path:
+    """用 moviepy 拼接一组片段（同时打开的片段数由调用方控制）"""
+    from moviepy.editor import VideoFileClip, concatenate_videoclips
 
-        # 加载所有片段
+    clips = []
+    try:
+        # 加载片段
         for path in video_paths:
             clip = VideoFileClip(str(path))
             clips.append(clip)
 
         # 合并视频
         final_clip = concatenate_videoclips(clips, method="compose")
-        output_path = task_dir / "final_output.mp4"
 
-        # 写入文件
+        # 写入文件（中间片段同样按统一参数编码）
+        profile = encode_profile()
         final_clip.write_videofile(
             str(output_path),
-            codec="libx264",
-            audio_codec="aac",
-            threads=4,
+            fps=profile["fps"],
+            codec=profile["video_codec"],
+            audio_codec=profile["audio_codec"],
+            audio_fps=profile["audio_rate"],
+            ffmpeg_params=["-vf", scale_pad_filter(profile), *video_encoder_args(profile)],
+            threads=threads,
             verbose=False,
             logger=None
         )
-
-        logger.info(f"最终视频已生成: {output_path}")
         return output_path
 
     except Exception as e:
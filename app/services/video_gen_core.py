@@ -2,18 +2,46 @@ import base64
 import imghdr
 import logging
 import os
-
-import requests
-from PIL import Image
-from volcenginesdkarkruntime import Ark
+import threading
 
 from app.config import settings
+from app.utils.downloader import download
+from app.utils.executors import run_io
+from app.utils.metrics import instrument
 
 # 配置日志记录
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# 检查并获取 API Key
-client = Ark(api_key=settings.ARK_API_KEY)
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Ark 同步客户端，首次使用时创建（SDK 导入较慢，只提供接口的进程无需加载）"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from volcenginesdkarkruntime import Ark
+                _client = Ark(api_key=settings.ARK_API_KEY, base_url=settings.ARK_BASE_URL)
+    return _client
+
+
+def _create_async_client():
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            from volcenginesdkarkruntime import AsyncArk
+            _async_client = AsyncArk(api_key=settings.ARK_API_KEY, base_url=settings.ARK_BASE_URL)
+    return _async_client
+
+
+async def get_async_client():
+    """Ark 异步客户端，首次创建（导入 SDK）在 I/O 线程中进行，不阻塞事件循环"""
+    if _async_client is not None:
+        return _async_client
+    return await run_io(_create_async_client)
 
 
 # 初始化客户端
@@ -38,6 +66,7 @@ def encode_image_to_base64(image_path: str) -> str:
             raise ValueError("仅支持 JPG/JPEG 格式图片")
 
         # 验证图片完整性
+        from PIL import Image
         try:
             with Image.open(image_path) as img:
                 img.verify()  # 校验图片是否损坏
@@ -64,6 +93,22 @@ def encode_image_to_base64(image_path: str) -> str:
         raise
 
 
+def _video_task_content(text_prompt, image_base64):
+    return [
+        {
+            "type": "text",
+            "text": text_prompt
+        },
+        {
+            "type": "image_url",
+            "image_url": {
+                "url": image_base64
+            }
+        }
+    ]
+
+
+@instrument("ark", "create")
 def create_video_generation_task(model_id, text_prompt, image_base64):
     """
     创建视频生成任务
@@ -74,20 +119,25 @@ def create_video_generation_task(model_id, text_prompt, image_base64):
     """
     try:
         logging.info("正在创建视频生成任务...")
-        create_result = client.content_generation.tasks.create(
+        create_result = get_client().content_generation.tasks.create(
+            model=model_id,
+            content=_video_task_content(text_prompt, image_base64)
+        )
+        logging.info(f"视频生成任务创建成功，任务 ID: {create_result.id}")
+        return create_result
+    except Exception as e:
+        logging.error(f"创建视频生成任务失败: {e}")
+        raise
+
+
+@instrument("ark", "create")
+async def create_video_generation_task_async(model_id, text_prompt, image_base64):
+    """create_video_generation_task 的异步版本"""
+    try:
+        logging.info("正在创建视频生成任务...")
+        create_result = await (await get_async_client()).content_generation.tasks.create(
             model=model_id,
-            content=[
-                {
-                    "type": "text",
-                    "text": text_prompt
-                },
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": image_base64
-                    }
-                }
-            ]
+            content=_video_task_content(text_prompt, image_base64)
         )
         logging.info(f"视频生成任务创建成功，任务 ID: {create_result.id}")
         return create_result
@@ -96,6 +146,7 @@ def create_video_generation_task(model_id, text_prompt, image_base64):
         raise
 
 
+@instrument("ark", "get")
 def get_video_generation_task(task_id):
     """
     获取视频生成任务信息
@@ -103,9 +154,22 @@ def get_video_generation_task(task_id):
     :return: 任务信息
     """
     try:
-        logging.info(f"正在获取任务 {task_id} 的信息...")
-        get_result = client.content_generation.tasks.get(task_id=task_id)
-        logging.info(f"成功获取任务 {task_id} 的信息: {get_result}")
+        logging.debug(f"正在获取任务 {task_id} 的信息...")
+        get_result = get_client().content_generation.tasks.get(task_id=task_id)
+        logging.debug(f"成功获取任务 {task_id} 的信息: {get_result}")
+        return get_result
+    except Exception as e:
+        logging.error(f"获取任务 {task_id} 的信息失败: {e}")
+        raise
+
+
+@instrument("ark", "get")
+async def get_video_generation_task_async(task_id):
+    """get_video_generation_task 的异步版本"""
+    try:
+        logging.debug(f"正在获取任务 {task_id} 的信息...")
+        get_result = await (await get_async_client()).content_generation.tasks.get(task_id=task_id)
+        logging.debug(f"成功获取任务 {task_id} 的信息: {get_result}")
         return get_result
     except Exception as e:
         logging.error(f"获取任务 {task_id} 的信息失败: {e}")
@@ -134,7 +198,7 @@ def list_video_generation_tasks(page_num, page_size, status=None, model=None, ta
             params["model"] = model
         if task_ids:
             params["task_ids"] = task_ids
-        list_result = client.content_generation.tasks.list(**params)
+        list_result = get_client().content_generation.tasks.list(**params)
         logging.info(f"成功列出视频生成任务列表: {list_result}")
         return list_result
     except Exception as e:
@@ -142,6 +206,28 @@ def list_video_generation_tasks(page_num, page_size, status=None, model=None, ta
         raise
 
 
+@instrument("ark", "list")
+async def list_video_generation_tasks_async(page_num, page_size, task_ids):
+    """
+    按任务 ID 批量查询视频生成任务（供集中轮询使用）
+    :param page_num: 页码
+    :param page_size: 每页数据量
+    :param task_ids: 任务 ID 列表
+    :return: 任务列表
+    """
+    try:
+        logging.debug(f"正在批量查询 {len(task_ids)} 个视频生成任务...")
+        return await (await get_async_client()).content_generation.tasks.list(
+            page_num=page_num,
+            page_size=page_size,
+            task_ids=task_ids
+        )
+    except Exception as e:
+        logging.error(f"批量查询视频生成任务失败: {e}")
+        raise
+
+
+@instrument("ark", "delete")
 def delete_video_generation_task(task_id):
     """
     删除视频生成任务
@@ -149,13 +235,26 @@ def delete_video_generation_task(task_id):
     """
     try:
         logging.info(f"正在删除任务 {task_id}...")
-        client.content_generation.tasks.delete(task_id=task_id)
+        get_client().content_generation.tasks.delete(task_id=task_id)
+        logging.info(f"任务 {task_id} 删除成功")
+    except Exception as e:
+        logging.error(f"删除任务 {task_id} 失败: {e}")
+        raise
+
+
+@instrument("ark", "delete")
+async def delete_video_generation_task_async(task_id):
+    """delete_video_generation_task 的异步版本"""
+    try:
+        logging.info(f"正在删除任务 {task_id}...")
+        await (await get_async_client()).content_generation.tasks.delete(task_id=task_id)
         logging.info(f"任务 {task_id} 删除成功")
     except Exception as e:
         logging.error(f"删除任务 {task_id} 失败: {e}")
         raise
 
 
+@instrument("ark", "download")
 def download_video(video_url, save_path):
     """
     下载视频到本地
@@ -164,10 +263,7 @@ def download_video(video_url, save_path):
     """
     try:
         logging.info(f"正在从 {video_url} 下载视频到 {save_path}...")
-        response = requests.get(video_url)
-        response.raise_for_status()
-        with open(save_path, 'wb') as f:
-            f.write(response.content)
+        download(video_url, save_path)
         logging.info(f"视频下载成功，保存到 {save_path}")
     except Exception as e:
         logging.error(f"视频下载失败: {e}")
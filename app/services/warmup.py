@@ -0,0 +1,43 @@
+import asyncio
+import importlib
+import logging
+import time
+from typing import Iterable, Optional
+
+from app.config import settings
+from app.services import video_gen_core
+from app.services.image_gen import ImageGenerator
+from app.utils.executors import cpu_workers, run_cpu, run_io
+
+logger = logging.getLogger(__name__)
+
+# 执行任务时才用到的供应商 SDK 与图片库，只提供接口的进程不加载
+WORKER_MODULES = ("openai", "volcenginesdkarkruntime", "volcengine.visual.VisualService", "PIL.Image")
+# 编码进程（spawn 方式启动）中执行的模块
+ENCODE_MODULES = ("app.services.video_gen", "moviepy.editor")
+
+
+def import_modules(names: Iterable[str]):
+    for name in names:
+        importlib.import_module(name)
+
+
+async def warm_up(image_generator: Optional[ImageGenerator] = None):
+    """
+    后台预热：导入重型模块、创建供应商客户端、拉起编码进程，首个任务不再承担冷启动耗时
+    延迟 WARM_UP_DELAY 秒执行，不拖慢服务启动与端口绑定；失败时各模块仍会在首次使用时加载
+    """
+    await asyncio.sleep(settings.WARM_UP_DELAY)
+    started = time.perf_counter()
+    try:
+        await run_io(import_modules, WORKER_MODULES)
+        await run_io(video_gen_core.get_client)
+        await video_gen_core.get_async_client()
+        if image_generator is not None:
+            await image_generator.get_service()
+        # 同时提交与进程数相同的导入任务，进程池为每个提交拉起一个编码进程
+        await asyncio.gather(*[run_cpu(import_modules, ENCODE_MODULES) for _ in range(cpu_workers())])
+    except Exception as e:
+        logger.warning(f"预热失败，将在首次使用时加载: {str(e)}")
+        return
+    logger.info(f"预热完成，耗时 {time.perf_counter() - started:.1f} 秒")
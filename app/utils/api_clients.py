@@ -2,39 +2,153 @@ import requests
 import json
 import hmac
 import hashlib
+import threading
 from datetime import datetime
+from typing import AsyncIterator
 from app.config import settings
-from openai import OpenAI
+from app.utils import llm_cache
+from app.utils.executors import run_io
+from app.utils.metrics import track_call
+
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def _get_client():
+    """复用同步客户端（保持连接池）；重试统一由调用方的重试预算控制"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # openai SDK 导入较慢，首次调用时才加载
+                from openai import OpenAI
+                _client = OpenAI(
+                    api_key=settings.DASHSCOPE_API_KEY,
+                    base_url=settings.DEEPSEEK_URL,
+                    max_retries=0
+                )
+    return _client
+
+
+def _create_async_client():
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            from openai import AsyncOpenAI
+            _async_client = AsyncOpenAI(
+                api_key=settings.DASHSCOPE_API_KEY,
+                base_url=settings.DEEPSEEK_URL,
+                max_retries=0
+            )
+    return _async_client
+
+
+async def _get_async_client():
+    """复用异步客户端（保持连接池）；首次创建（导入 SDK）在 I/O 线程中进行，不阻塞事件循环"""
+    if _async_client is not None:
+        return _async_client
+    return await run_io(_create_async_client)
+
+
+def _completion_params(prompt: str, max_tokens: int = 2000) -> dict:
+    return {
+        "model": settings.DEEPSEEK_MODEL,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.7,
+        "max_tokens": max_tokens
+    }
+
+
+def _request_error(e: Exception) -> ConnectionError:
+    error_msg = f"DeepSeek API请求失败: {str(e)}"
+    if getattr(e, 'response', None) is not None:
+        error_msg += f"\n响应状态码: {e.response.status_code}"
+        error_msg += f"\n响应内容: {e.response.text}"
+    return ConnectionError(error_msg)
 
 
 def deepseek_request(prompt: str) -> str:
-    client = OpenAI(
-        api_key=settings.DASHSCOPE_API_KEY,
-        base_url=settings.DEEPSEEK_URL
-    )
+    params = _completion_params(prompt)
+    cache_key = llm_cache.completion_key(params)
+    cached = llm_cache.get_completion(cache_key)
+    if cached is not None:
+        return cached
 
     try:
-        completion = client.chat.completions.create(
-            model=settings.DEEPSEEK_MODEL,
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=2000
-        )
+        with track_call("deepseek", "chat"):
+            completion = _get_client().chat.completions.create(**params)
 
         # # 阿里云返回结构处理
         # if hasattr(completion.choices[0].message, 'reasoning_content'):
         #     print(f"[DEBUG] 思考过程: {completion.choices[0].message.reasoning_content}")
 
-        return completion.choices[0].message.content
+        result = completion.choices[0].message.content
+
+    except Exception as e:
+        raise _request_error(e) from e
+
+    llm_cache.put_completion(cache_key, result)
+    return result
+
+
+async def deepseek_request_async(prompt: str, max_tokens: int = 2000) -> str:
+    """deepseek_request 的异步版本，不占用线程"""
+    params = _completion_params(prompt, max_tokens)
+    cache_key = llm_cache.completion_key(params)
+    cached = await run_io(llm_cache.get_completion, cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        with track_call("deepseek", "chat"):
+            completion = await (await _get_async_client()).chat.completions.create(**params)
+        result = completion.choices[0].message.content
 
     except Exception as e:
-        error_msg = f"DeepSeek API请求失败: {str(e)}"
-        if hasattr(e, 'response'):
-            error_msg += f"\n响应状态码: {e.response.status_code}"
-            error_msg += f"\n响应内容: {e.response.text}"
-        raise ConnectionError(error_msg) from e
+        raise _request_error(e) from e
+
+    await run_io(llm_cache.put_completion, cache_key, result)
+    return result
+
+
+async def deepseek_stream_async(prompt: str) -> AsyncIterator[str]:
+    """
+    流式请求 DeepSeek，逐段产出增量文本
+    缓存命中时一次性产出完整响应；流结束后完整响应写入缓存
+    """
+    params = _completion_params(prompt)
+    cache_key = llm_cache.completion_key(params)
+    cached = await run_io(llm_cache.get_completion, cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+    try:
+        # 耗时计至流结束
+        with track_call("deepseek", "chat_stream"):
+            stream = await (await _get_async_client()).chat.completions.create(**params, stream=True)
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+
+    except Exception as e:
+        raise _request_error(e) from e
+
+    await run_io(llm_cache.put_completion, cache_key, "".join(parts))
+
+
+def forget_response(prompt: str, max_tokens: int = 2000):
+    """响应未通过校验时从缓存中移除，保证重试会真正重新请求"""
+    llm_cache.forget_completion(llm_cache.completion_key(_completion_params(prompt, max_tokens)))
 
 
 def volcano_sign_request(method: str, path: str, params: dict, service: str = "cv") -> dict:
@@ -0,0 +1,246 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+PART_SUFFIX = ".part"
+# 记录 .part 来源（URL 与 ETag/Last-Modified），续传前校验，避免把另一个文件的内容接在后面
+PART_META_SUFFIX = ".part.meta"
+
+# 连接中断、超时等可以通过续传恢复的错误
+_TRANSIENT_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+class DownloadError(Exception):
+    """下载失败或校验不通过"""
+    pass
+
+
+class _RetryableStatus(Exception):
+    pass
+
+
+def get_session() -> requests.Session:
+    """进程内共享的 HTTP 会话（连接池复用，避免每次下载重新握手）"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=settings.IO_MAX_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def download(url: str, dest: Path, timeout: Optional[float] = None) -> Path:
+    """
+    下载文件到 dest
+    先流式写入 dest.part，中途断开时按已写入的字节数用 Range 续传（带 If-Range，来源不同的 .part 直接丢弃）；
+    服务端支持 Range 且文件较大时分段并行下载。完成后按 Content-Length 校验再改名为 dest。
+    :param url: 下载地址
+    :param dest: 保存路径
+    :param timeout: 连接/读取超时（秒），默认 DOWNLOAD_TIMEOUT
+    :return: 保存路径
+    """
+    dest = Path(dest)
+    part_path = dest.with_name(dest.name + PART_SUFFIX)
+    meta_path = dest.with_name(dest.name + PART_META_SUFFIX)
+    timeout = timeout or settings.DOWNLOAD_TIMEOUT
+
+    size, accepts_ranges, validator = _probe(url, timeout)
+    validator = _check_part(part_path, meta_path, url, validator)
+    _write_part_meta(meta_path, url, validator)
+    if (accepts_ranges and size is not None and size >= settings.DOWNLOAD_PARALLEL_MIN_BYTES
+            and settings.DOWNLOAD_PARALLEL_PARTS > 1):
+        _download_parallel(url, part_path, size, timeout, validator)
+    else:
+        size = _download_stream(url, part_path, meta_path, size, timeout, validator)
+
+    actual = part_path.stat().st_size
+    if size is not None and actual != size:
+        part_path.unlink()
+        meta_path.unlink(missing_ok=True)
+        raise DownloadError(f"下载文件不完整: 期望 {size} 字节，实际 {actual} 字节")
+    os.replace(part_path, dest)
+    meta_path.unlink(missing_ok=True)
+    return dest
+
+
+def _validator(headers) -> Optional[str]:
+    """可用于 If-Range 的资源版本标识：优先强 ETag，其次 Last-Modified"""
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+
+def _read_part_meta(meta_path: Path) -> Optional[dict]:
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_part_meta(meta_path: Path, url: str, validator: Optional[str]):
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"url": url, "validator": validator}, f)
+
+
+def _check_part(part_path: Path, meta_path: Path, url: str, validator: Optional[str]) -> Optional[str]:
+    """
+    已有的 .part 来自其他 URL 或资源已变更（版本标识不一致）时删除，不在其上续传
+    :return: 续传使用的版本标识（探测失败时沿用 .part 记录的标识）
+    """
+    if not part_path.exists():
+        return validator
+    meta = _read_part_meta(meta_path)
+    if meta is None or meta.get("url") != url or (
+            validator and meta.get("validator") and meta["validator"] != validator):
+        logger.info(f"丢弃来源不一致的未完成下载: {part_path}")
+        part_path.unlink()
+        return validator
+    return validator or meta.get("validator")
+
+
+def _probe(url: str, timeout: float) -> Tuple[Optional[int], bool, Optional[str]]:
+    """HEAD 请求获取文件大小、是否支持 Range 与资源版本标识，失败时按未知处理"""
+    try:
+        response = get_session().head(url, timeout=timeout, allow_redirects=True)
+        if response.status_code != 200:
+            return None, False, None
+        validator = _validator(response.headers)
+        length = response.headers.get("Content-Length")
+        if "Content-Encoding" in response.headers:
+            # 压缩传输时 Content-Length 不是文件大小
+            return None, False, validator
+        accepts_ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+        return (int(length) if length else None), accepts_ranges, validator
+    except (requests.exceptions.RequestException, ValueError):
+        return None, False, None
+
+
+def _backoff(attempt: int):
+    time.sleep(min(2 ** attempt, 10))
+
+
+def _check_status(response: requests.Response):
+    if response.status_code >= 500 or response.status_code == 429:
+        raise _RetryableStatus(f"状态码 {response.status_code}")
+    response.raise_for_status()
+
+
+def _download_stream(url: str, part_path: Path, meta_path: Path, size: Optional[int], timeout: float,
+                     validator: Optional[str] = None) -> Optional[int]:
+    """
+    单连接流式下载，断线后从 .part 已有长度处续传；返回期望的文件大小
+    续传带 If-Range：资源已变更时服务端返回完整内容（200），从头写入
+    """
+    for attempt in range(settings.DOWNLOAD_MAX_ATTEMPTS):
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        if size is not None and offset == size:
+            return size
+        headers = {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            if validator:
+                headers["If-Range"] = validator
+        try:
+            with get_session().get(url, headers=headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 416:
+                    # 已写入的内容超出文件长度，重新下载
+                    part_path.unlink()
+                    continue
+                _check_status(response)
+
+                if response.status_code == 206:
+                    mode = "ab"
+                    total = response.headers.get("Content-Range", "").rpartition("/")[2]
+                    if total.isdigit():
+                        size = int(total)
+                else:
+                    # 服务端忽略了 Range 或资源已变更，从头写入，并记录本次内容的版本标识
+                    mode = "wb"
+                    length = response.headers.get("Content-Length")
+                    encoded = "Content-Encoding" in response.headers
+                    size = int(length) if length and not encoded else None
+                    validator = _validator(response.headers)
+                    _write_part_meta(meta_path, url, validator)
+
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=settings.DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+            return size
+        except (_TRANSIENT_ERRORS + (_RetryableStatus,)) as e:
+            logger.warning(f"下载中断（第 {attempt + 1} 次），稍后续传: {str(e)}")
+            _backoff(attempt)
+    raise DownloadError(f"下载失败，已重试 {settings.DOWNLOAD_MAX_ATTEMPTS} 次: {url}")
+
+
+def _download_parallel(url: str, part_path: Path, size: int, timeout: float, validator: Optional[str] = None):
+    """
+    按字节区间分段并行下载，各段独立续传，直接写入预分配文件的对应位置
+    各段请求带 If-Range，下载过程中资源变更时服务端返回 200，整体失败而不是拼接两个版本
+    """
+    parts = settings.DOWNLOAD_PARALLEL_PARTS
+    step = -(-size // parts)
+    ranges = [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+
+    with open(part_path, "wb") as f:
+        f.truncate(size)
+
+    fd = os.open(part_path, os.O_WRONLY)
+    try:
+        with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="download") as pool:
+            futures = [
+                pool.submit(_fetch_range, url, fd, start, end, timeout, validator) for start, end in ranges
+            ]
+            for future in futures:
+                future.result()
+    except Exception:
+        os.close(fd)
+        part_path.unlink()
+        raise
+    os.close(fd)
+
+
+def _fetch_range(url: str, fd: int, start: int, end: int, timeout: float, validator: Optional[str] = None):
+    position = start
+    for attempt in range(settings.DOWNLOAD_MAX_ATTEMPTS):
+        headers = {"Range": f"bytes={position}-{end}"}
+        if validator:
+            headers["If-Range"] = validator
+        try:
+            with get_session().get(url, headers=headers, stream=True, timeout=timeout) as response:
+                _check_status(response)
+                if response.status_code != 206:
+                    raise DownloadError("服务端未按区间返回数据")
+                for chunk in response.iter_content(chunk_size=settings.DOWNLOAD_CHUNK_SIZE):
+                    os.pwrite(fd, chunk, position)
+                    position += len(chunk)
+            if position != end + 1:
+                raise DownloadError(f"区间 {start}-{end} 不完整")
+            return
+        except (_TRANSIENT_ERRORS + (_RetryableStatus,)) as e:
+            logger.warning(f"区间 {start}-{end} 下载中断（第 {attempt + 1} 次），稍后续传: {str(e)}")
+            _backoff(attempt)
+    raise DownloadError(f"区间 {start}-{end} 下载失败，已重试 {settings.DOWNLOAD_MAX_ATTEMPTS} 次")
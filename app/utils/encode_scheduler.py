@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Optional
+
+from app.utils import profiling, tracing
+from app.utils.executors import available_cores, cpu_workers, encode_threads, run_cpu
+
+logger = logging.getLogger(__name__)
+
+
+def _timed_call(func: Callable, *args, **kwargs) -> tuple:
+    """在编码子进程中执行 func，连同子进程号与起止时间一起返回"""
+    started = time.time()
+    result = func(*args, **kwargs)
+    return result, os.getpid(), started, time.time()
+
+
+class EncodeScheduler:
+    """
+    本机编码调度器
+    进程内所有任务的场景编码、成片拼接都经由这里提交到 CPU 进程池，
+    同时运行的编码数不超过进程池大小，每次编码的线程数按 可用核数 / 进程数 分配，
+    排队中的编码按提交顺序等待。
+    """
+
+    def __init__(self):
+        self.workers = cpu_workers()
+        self.threads = encode_threads()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self._busy_seconds = 0.0
+        self._started_at = time.time()
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def submit(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        提交编码任务，func 需接受 threads 关键字参数
+        :return: func 的返回值
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+
+        self.queued += 1
+        try:
+            with tracing.span("encode.queue", "wait"):
+                await self._slots.acquire()
+        finally:
+            self.queued -= 1
+
+        self.running += 1
+        started = time.time()
+        try:
+            name = getattr(func, "__name__", "encode")
+            profile = profiling.current()
+            with tracing.span("encode.dispatch", "encode", func=name):
+                if profile is None:
+                    result, pid, run_started, run_ended = await run_cpu(
+                        _timed_call, func, *args, threads=self.threads, **kwargs
+                    )
+                else:
+                    (result, stats, stacks), pid, run_started, run_ended = await run_cpu(
+                        _timed_call, profiling.profiled_call, profiling.stack_root(func),
+                        func, *args, threads=self.threads, **kwargs
+                    )
+                    profile.merge(stats, stacks)
+            # 编码子进程内的实际执行区间，在时间线上按子进程单独成组
+            trace = tracing.current()
+            if trace is not None:
+                trace.add(name, "encode", run_started, run_ended, pid=pid)
+            return result
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self._busy_seconds += time.time() - started
+            self._slots.release()
+
+    def stats(self) -> dict:
+        uptime = max(time.time() - self._started_at, 1e-6)
+        return {
+            "cores": available_cores(),
+            "workers": self.workers,
+            "threads_per_encode": self.threads,
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            # 当前占用的编码槽比例，及启动以来编码槽的平均占用率
+            "utilization": self.running / self.workers,
+            "busy_ratio": min(1.0, self._busy_seconds / (uptime * self.workers)),
+        }
+
+
+_scheduler: Optional[EncodeScheduler] = None
+
+
+def get_scheduler() -> EncodeScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = EncodeScheduler()
+        logger.info(f"编码调度器：{_scheduler.workers} 个进程 x {_scheduler.threads} 线程")
+    return _scheduler
+
+
+async def submit(func: Callable, *args, **kwargs) -> Any:
+    """提交编码任务到本机调度器"""
+    return await get_scheduler().submit(func, *args, **kwargs)
+
+
+def stats() -> dict:
+    return get_scheduler().stats()
@@ -0,0 +1,89 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.config import settings
+from app.utils import profiling
+
+logger = logging.getLogger(__name__)
+
+# I/O 线程池：供应商接口调用、文件下载等阻塞 I/O
+_io_executor = None
+# CPU 进程池：moviepy/ffmpeg 编码等 CPU 密集任务
+_cpu_executor = None
+
+
+def available_cores() -> int:
+    """当前进程可用的 CPU 核数（遵循 taskset/cgroup 设置的亲和性）"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def encode_threads() -> int:
+    """单个编码进程使用的线程数"""
+    return settings.ENCODE_THREADS or min(4, available_cores())
+
+
+def cpu_workers() -> int:
+    """CPU 进程池大小：默认按 可用核数 / 单次编码线程数 计算，避免超额订阅"""
+    return settings.CPU_MAX_WORKERS or max(1, available_cores() // encode_threads())
+
+
+def io_executor() -> ThreadPoolExecutor:
+    """获取全局 I/O 线程池"""
+    global _io_executor
+    if _io_executor is None:
+        _io_executor = ThreadPoolExecutor(
+            max_workers=settings.IO_MAX_WORKERS,
+            thread_name_prefix="io"
+        )
+    return _io_executor
+
+
+def cpu_executor() -> ProcessPoolExecutor:
+    """获取全局 CPU 进程池（spawn 方式启动，避免 fork 继承线程状态）"""
+    global _cpu_executor
+    if _cpu_executor is None:
+        _cpu_executor = ProcessPoolExecutor(
+            max_workers=cpu_workers(),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _cpu_executor
+
+
+async def run_io(func: Callable, *args, **kwargs) -> Any:
+    """在 I/O 线程池中执行阻塞函数，不阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    # 与 asyncio.to_thread 一样带上调用方的上下文（任务追踪等 contextvars）
+    context = contextvars.copy_context()
+    profile = profiling.current()
+    if profile is not None:
+        return await loop.run_in_executor(
+            io_executor(), functools.partial(context.run, profiling.sample_call, profile, func, *args, **kwargs)
+        )
+    return await loop.run_in_executor(io_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+async def run_cpu(func: Callable, *args, **kwargs) -> Any:
+    """在 CPU 进程池中执行编码等计算任务，func 及参数必须可被 pickle"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown():
+    """关闭全局线程池与进程池"""
+    global _io_executor, _cpu_executor
+    if _io_executor is not None:
+        _io_executor.shutdown(wait=False, cancel_futures=True)
+        _io_executor = None
+    if _cpu_executor is not None:
+        _cpu_executor.shutdown(wait=False, cancel_futures=True)
+        _cpu_executor = None
+    logger.info("执行器已关闭")
@@ -0,0 +1,226 @@
+import logging
+import os
+import re
+import subprocess
+from pathlib import Path
+from typing import List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class FFmpegError(Exception):
+    """ffmpeg 不可用或执行失败"""
+    pass
+
+
+def ffmpeg_binary() -> str:
+    """imageio-ffmpeg 自带的 ffmpeg 可执行文件（moviepy 使用同一个）"""
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception as e:
+        raise FFmpegError(f"未找到 ffmpeg: {str(e)}")
+
+
+def run_ffmpeg(args: List[str]) -> subprocess.CompletedProcess:
+    """执行 ffmpeg，失败时抛出带 stderr 末尾内容的 FFmpegError"""
+    cmd = [ffmpeg_binary(), "-hide_banner", "-nostdin", "-y", *args]
+    logger.debug(f"执行: {' '.join(cmd)}")
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        stderr = result.stderr.decode("utf-8", errors="replace")
+        raise FFmpegError(f"ffmpeg 退出码 {result.returncode}: {stderr[-2000:]}")
+    return result
+
+
+def probe_duration(path: Path) -> float:
+    """读取媒体时长（秒），解析 ffmpeg -i 输出的 Duration 行"""
+    result = subprocess.run(
+        [ffmpeg_binary(), "-hide_banner", "-nostdin", "-i", str(path)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    stderr = result.stderr.decode("utf-8", errors="replace")
+    match = re.search(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)", stderr)
+    if not match:
+        raise FFmpegError(f"无法读取时长 {path}: {stderr[-500:]}")
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def encode_profile() -> dict:
+    """
+    场景片段统一的编码参数
+    所有片段分辨率、帧率、像素格式、关键帧间隔与音频采样率一致，成片才能直接流拷贝拼接
+    """
+    return {
+        "width": settings.VIDEO_WIDTH,
+        "height": settings.VIDEO_HEIGHT,
+        "fps": settings.VIDEO_FPS,
+        "gop": settings.VIDEO_GOP,
+        "pix_fmt": "yuv420p",
+        "video_codec": "libx264",
+        "audio_codec": "aac",
+        "audio_rate": settings.AUDIO_SAMPLE_RATE,
+        "audio_channels": 2,
+    }
+
+
+def scale_pad_filter(profile: dict) -> str:
+    """等比缩放后居中补边到统一分辨率"""
+    w, h = profile["width"], profile["height"]
+    return (f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+            f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,setsar=1")
+
+
+def video_encoder_args(profile: dict) -> List[str]:
+    """统一编码参数对应的视频输出选项（固定 GOP、关闭场景切换插入关键帧）"""
+    gop = str(profile["gop"])
+    return [
+        "-r", str(profile["fps"]),
+        "-pix_fmt", profile["pix_fmt"],
+        "-g", gop, "-keyint_min", gop, "-sc_threshold", "0",
+    ]
+
+
+def encoder_args(profile: dict) -> List[str]:
+    """统一编码参数对应的完整音视频输出选项"""
+    return [
+        "-c:v", profile["video_codec"],
+        *video_encoder_args(profile),
+        "-c:a", profile["audio_codec"],
+        "-ar", str(profile["audio_rate"]),
+        "-ac", str(profile["audio_channels"]),
+    ]
+
+
+def render_scene(video_path: Path, audio_path: Path, output_path: Path, profile: dict,
+                 threads: int = 0) -> Path:
+    """
+    单次 ffmpeg 调用完成场景合成：以音频时长为准，视频过长则裁剪、过短则冻结最后一帧补足，
+    缩放补边到统一分辨率后与音频一起编码，画面帧不经过 Python
+    :param threads: 编码线程数，0 表示由 ffmpeg 自动决定
+    """
+    audio_duration = probe_duration(audio_path)
+    video_duration = probe_duration(video_path)
+    pad_duration = max(0.0, audio_duration - video_duration)
+
+    filter_graph = (
+        f"[0:v]fps={profile['fps']},"
+        f"tpad=stop_mode=clone:stop_duration={pad_duration + 1:.3f},"
+        f"trim=duration={audio_duration:.3f},setpts=PTS-STARTPTS,"
+        f"{scale_pad_filter(profile)},format={profile['pix_fmt']}[v]"
+    )
+    run_ffmpeg([
+        "-i", str(video_path),
+        "-i", str(audio_path),
+        "-filter_complex", filter_graph,
+        "-map", "[v]", "-map", "1:a:0",
+        *encoder_args(profile),
+        "-threads", str(threads),
+        "-t", f"{audio_duration:.3f}",
+        "-movflags", "+faststart",
+        str(output_path)
+    ])
+    return output_path
+
+
+# 本地运镜：放大推近、缩小拉远、左右平移，按场景轮换
+KEN_BURNS_MOTIONS = ("zoom_in", "zoom_out", "pan_right", "pan_left")
+
+
+def _zoompan_expr(motion: str, frames: int) -> str:
+    step = 0.25 / frames  # 全程缩放 25%
+    if motion == "zoom_in":
+        zoom, x, y = f"1+{step}*on", "iw/2-(iw/zoom/2)", "ih/2-(ih/zoom/2)"
+    elif motion == "zoom_out":
+        zoom, x, y = f"1.25-{step}*on", "iw/2-(iw/zoom/2)", "ih/2-(ih/zoom/2)"
+    elif motion == "pan_right":
+        zoom, x, y = "1.2", f"(iw-iw/zoom)*on/{frames}", "ih/2-(ih/zoom/2)"
+    else:
+        zoom, x, y = "1.2", f"(iw-iw/zoom)*(1-on/{frames})", "ih/2-(ih/zoom/2)"
+    return f"zoompan=z='{zoom}':x='{x}':y='{y}':d={frames}"
+
+
+def render_ken_burns(image_path: Path, output_path: Path, duration: float, motion: str, profile: dict,
+                     threads: int = 0) -> Path:
+    """
+    静态图片生成运镜视频片段（ffmpeg zoompan，纯 CPU），作为 Ark 视频生成的本地替代
+    先放大到两倍分辨率再平移缩放，避免 zoompan 取整造成的画面抖动
+    """
+    w, h, fps = profile["width"], profile["height"], profile["fps"]
+    frames = max(1, round(duration * fps))
+    filter_graph = (
+        f"[0:v]scale={w * 2}:{h * 2}:force_original_aspect_ratio=increase,crop={w * 2}:{h * 2},"
+        f"{_zoompan_expr(motion, frames)}:s={w}x{h}:fps={fps},"
+        f"setsar=1,format={profile['pix_fmt']}[v]"
+    )
+    run_ffmpeg([
+        "-i", str(image_path),
+        "-filter_complex", filter_graph,
+        "-map", "[v]",
+        "-c:v", profile["video_codec"], *video_encoder_args(profile),
+        "-threads", str(threads),
+        "-frames:v", str(frames),
+        "-movflags", "+faststart",
+        str(output_path)
+    ])
+    return output_path
+
+
+def extract_last_frame(video_path: Path, output_path: Path) -> Path:
+    """截取视频最后一帧保存为 JPG（用作串联生成下一片段的首帧）"""
+    run_ffmpeg([
+        "-sseof", "-0.5", "-i", str(video_path),
+        "-update", "1", "-q:v", "2",
+        str(output_path)
+    ])
+    return output_path
+
+
+def cut_audio(src_path: Path, output_path: Path, start: float, end: Optional[float] = None) -> Path:
+    """
+    按时间截取音频片段（流拷贝，精度为一个 MP3 帧）
+    先写临时文件再替换：output_path 可能是产物缓存对象的硬链接，原地覆盖会破坏缓存
+    """
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(f"{output_path.stem}.tmp{output_path.suffix}")
+    args = ["-i", str(src_path), "-ss", f"{start:.3f}"]
+    if end is not None:
+        args += ["-to", f"{end:.3f}"]
+    try:
+        run_ffmpeg([*args, "-c", "copy", "-map_metadata", "-1", str(tmp_path)])
+        os.replace(tmp_path, output_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return output_path
+
+
+def concat_copy(video_paths: List[Path], output_path: Path) -> Path:
+    """
+    通过 concat demuxer 流拷贝拼接片段，不解码不重新编码
+    demuxer 依次读取列表中的片段，场景数再多也只有一个 ffmpeg 进程、同一时刻一个输入
+    要求所有片段按 encode_profile() 编码
+    先写临时文件再替换：output_path 可能是产物缓存对象的硬链接，原地覆盖会破坏缓存
+    """
+    output_path = Path(output_path)
+    list_path = output_path.with_name(f"{output_path.stem}.concat.txt")
+    tmp_path = output_path.with_name(f"{output_path.stem}.tmp{output_path.suffix}")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in video_paths:
+            escaped = str(Path(path).resolve()).replace("'", r"'\''")
+            f.write(f"file '{escaped}'\n")
+    try:
+        run_ffmpeg([
+            "-f", "concat", "-safe", "0", "-i", str(list_path),
+            "-c", "copy", "-movflags", "+faststart",
+            str(tmp_path)
+        ])
+        os.replace(tmp_path, output_path)
+    finally:
+        os.remove(list_path)
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return output_path
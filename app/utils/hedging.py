@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import threading
+import time
+from functools import partial
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.config import settings
+from app.utils import tracing
+from app.utils.latency import get_tracker
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 落败请求被取消时携带的消息，用于区分“对冲落败”与“调用方被取消”
+HEDGE_LOST = "hedge_lost"
+
+# 被放弃的请求在后台完成，保留引用避免被回收
+_background = set()
+
+
+class HedgeBudget:
+    """按供应商统计原始请求数与对冲请求数，对冲请求不超过原始请求的 HEDGE_MAX_RATIO"""
+
+    def __init__(self):
+        self._primary: Dict[str, int] = {}
+        self._hedged: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record_primary(self, provider: str):
+        with self._lock:
+            self._primary[provider] = self._primary.get(provider, 0) + 1
+
+    def try_spend(self, provider: str) -> bool:
+        with self._lock:
+            hedged = self._hedged.get(provider, 0)
+            if hedged + 1 > self._primary.get(provider, 0) * settings.HEDGE_MAX_RATIO:
+                return False
+            self._hedged[provider] = hedged + 1
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                provider: {"primary": count, "hedged": self._hedged.get(provider, 0)}
+                for provider, count in self._primary.items()
+            }
+
+
+budget = HedgeBudget()
+
+
+def hedge_delay(provider: str) -> Optional[float]:
+    """发出对冲请求前的等待时间：近期耗时的 HEDGE_PERCENTILE 分位数，样本不足时不对冲"""
+    tracker = get_tracker(provider)
+    if not settings.HEDGE_ENABLED or tracker.count < settings.HEDGE_MIN_SAMPLES:
+        return None
+    return tracker.percentile(settings.HEDGE_PERCENTILE)
+
+
+async def hedged(provider: str, attempt: Callable[[int], Awaitable[T]],
+                 discard: Optional[Callable[[T], Awaitable[None]]] = None, record: bool = True) -> T:
+    """
+    对冲请求：原始请求超过近期耗时分位数仍未返回时发出一个重复请求，采用先成功的结果
+    落败的请求被取消，由 attempt 自行处理取消时的清理（见 shielded、lost）
+    :param provider: 供应商名称，用于耗时统计与对冲预算
+    :param attempt: 发起一次请求的协程函数，参数为请求序号（0 为原始请求）
+    :param discard: 清理同时完成的落败结果的协程函数（如删除远端任务、临时文件）
+    :param record: 是否记录请求耗时（耗时已由别处记录时传 False）
+    :return: 先成功的请求结果
+    """
+    tracker = get_tracker(provider)
+
+    async def timed(n: int) -> T:
+        started = time.time()
+        result = await attempt(n)
+        if record:
+            tracker.record(time.time() - started)
+        return result
+
+    budget.record_primary(provider)
+    delay = hedge_delay(provider)
+    pending = {asyncio.ensure_future(timed(0))}
+    settled = False
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done and budget.try_spend(provider):
+                logger.info(f"[{provider}] 请求超过 {delay:.1f} 秒未返回，发出对冲请求")
+                tracing.instant("hedge", "hedge", provider=provider, delay=round(delay, 3))
+                pending.add(asyncio.ensure_future(timed(1)))
+
+        first_error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            succeeded = [task for task in done if task.exception() is None]
+            if succeeded:
+                # 同一轮内同时成功的其他结果也需要清理
+                for task in succeeded[1:]:
+                    if discard is not None:
+                        _track(asyncio.ensure_future(discard(task.result())))
+                settled = True
+                return succeeded[0].result()
+            first_error = first_error or next(iter(done)).exception()
+        raise first_error
+    finally:
+        for task in pending:
+            task.cancel(HEDGE_LOST if settled else None)
+
+
+def lost(error: asyncio.CancelledError) -> bool:
+    """取消是否因为对冲落败（调用方自身被取消时远端状态可能还需保留以便恢复）"""
+    return HEDGE_LOST in error.args
+
+
+async def shielded(aw: Awaitable[T], cleanup: Callable[[T], Awaitable[None]]) -> T:
+    """
+    等待无法中断的请求（线程中的同步调用、已发出的创建请求）
+    被取消时请求在后台继续完成，成功的结果交给 cleanup 清理
+    """
+    inner = asyncio.ensure_future(aw)
+    try:
+        return await asyncio.shield(inner)
+    except asyncio.CancelledError:
+        inner.add_done_callback(partial(_cleanup_abandoned, cleanup=cleanup))
+        _track(inner)
+        raise
+
+
+def _track(task: asyncio.Future):
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+def _cleanup_abandoned(task: asyncio.Future, cleanup: Callable):
+    if task.cancelled() or task.exception() is not None:
+        return
+    _track(asyncio.ensure_future(cleanup(task.result())))
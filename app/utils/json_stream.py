@@ -0,0 +1,68 @@
+import json
+from typing import Any, List
+
+
+class JsonArrayStreamParser:
+    """
+    增量 JSON 数组解析器
+    逐块喂入模型的流式输出，每当顶层数组中的一个元素（对象）闭合时立即返回。
+    数组开始前的内容（如 ```json 代码块标记）和数组结束后的内容会被忽略。
+    """
+
+    def __init__(self):
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._buffer: List[str] = []
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        喂入一段文本
+        :param chunk: 流式输出的增量文本
+        :return: 本次新闭合的数组元素列表
+        """
+        items = []
+        for ch in chunk:
+            if self._finished:
+                break
+
+            if not self._started:
+                if ch == "[":
+                    self._started = True
+                continue
+
+            if self._depth == 0:
+                # 顶层数组内、元素之间
+                if ch in "{[":
+                    self._depth = 1
+                    self._buffer = [ch]
+                elif ch == "]":
+                    self._finished = True
+                continue
+
+            self._buffer.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    items.append(json.loads("".join(self._buffer)))
+                    self._buffer = []
+        return items
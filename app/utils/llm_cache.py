@@ -0,0 +1,136 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from app.config import settings
+from app.utils import metrics
+from app.utils.hashing import params_hash
+
+logger = logging.getLogger(__name__)
+
+# 持久化的 LLM 响应与阶段结果缓存（SQLite）：
+#   completions   key = sha256(模型 + 提示词 + 温度 + max_tokens)，带 TTL
+#   stage_results key = sha256(阶段 + 输入)，供分阶段接口复用已完成的文案/分镜
+# 两张表条目数超过 LLM_CACHE_MAX_ENTRIES 时按最近访问时间淘汰
+
+_init_lock = threading.Lock()
+_initialized = False
+
+_TABLES = ("completions", "stage_results")
+
+
+def _connect() -> sqlite3.Connection:
+    global _initialized
+    if not _initialized:
+        os.makedirs(settings.LLM_CACHE_PATH.parent, exist_ok=True)
+    conn = sqlite3.connect(str(settings.LLM_CACHE_PATH), timeout=30)
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                for table in _TABLES:
+                    conn.execute(
+                        f"CREATE TABLE IF NOT EXISTS {table} ("
+                        "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                        "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                    )
+                conn.commit()
+                _initialized = True
+    return conn
+
+
+def _get(table: str, key: str) -> Optional[str]:
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    now = time.time()
+    conn = _connect()
+    try:
+        row = conn.execute(f"SELECT value, created_at FROM {table} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        if now - created_at > settings.LLM_CACHE_TTL:
+            conn.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+            conn.commit()
+            return None
+        conn.execute(f"UPDATE {table} SET accessed_at = ? WHERE key = ?", (now, key))
+        conn.commit()
+        return value
+    finally:
+        conn.close()
+
+
+def _put(table: str, key: str, value: str):
+    if not settings.LLM_CACHE_ENABLED:
+        return
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute(
+            f"INSERT OR REPLACE INTO {table} (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, value, now, now)
+        )
+        # 淘汰过期与最久未访问的条目
+        conn.execute(f"DELETE FROM {table} WHERE created_at < ?", (now - settings.LLM_CACHE_TTL,))
+        conn.execute(
+            f"DELETE FROM {table} WHERE key IN ("
+            f"SELECT key FROM {table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (settings.LLM_CACHE_MAX_ENTRIES,)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _delete(table: str, key: str):
+    conn = _connect()
+    try:
+        conn.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def completion_key(params: dict) -> str:
+    """请求参数中决定响应内容的部分：模型、消息、温度、max_tokens"""
+    return params_hash({
+        "model": params["model"],
+        "messages": params["messages"],
+        "temperature": params.get("temperature"),
+        "max_tokens": params.get("max_tokens")
+    })
+
+
+def get_completion(key: str) -> Optional[str]:
+    value = _get("completions", key)
+    if settings.LLM_CACHE_ENABLED:
+        metrics.count_cache("llm", "completion", value is not None)
+    if value is not None:
+        logger.info(f"LLM 响应缓存命中 {key[:12]}")
+    return value
+
+
+def put_completion(key: str, response: str):
+    _put("completions", key, response)
+
+
+def forget_completion(key: str):
+    """丢弃无效响应，避免重试时再次命中"""
+    _delete("completions", key)
+
+
+def get_stage(stage: str, inputs: Any) -> Optional[Any]:
+    value = _get("stage_results", params_hash({"stage": stage, "inputs": inputs}))
+    if settings.LLM_CACHE_ENABLED:
+        metrics.count_cache("llm", stage, value is not None)
+    if value is None:
+        return None
+    logger.info(f"阶段结果缓存命中 [{stage}]")
+    return json.loads(value)
+
+
+def put_stage(stage: str, inputs: Any, result: Any):
+    _put("stage_results", params_hash({"stage": stage, "inputs": inputs}), json.dumps(result, ensure_ascii=False))
@@ -0,0 +1,99 @@
+import asyncio
+import re
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from app.utils import tracing
+
+# 供应商调用从几十毫秒到数分钟（Ark 生成）不等，阶段耗时同理
+_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600, float("inf"))
+
+JOBS_IN_FLIGHT = Gauge("video_maker_jobs_in_flight", "正在执行的任务数")
+JOBS = Counter("video_maker_jobs_total", "已结束的任务数", ["outcome"])
+JOB_SECONDS = Histogram("video_maker_job_seconds", "单次任务执行耗时", buckets=_BUCKETS)
+
+STAGE_SECONDS = Histogram("video_maker_stage_seconds", "流水线阶段耗时", ["stage"], buckets=_BUCKETS)
+STAGES_IN_FLIGHT = Gauge("video_maker_stages_in_flight", "正在执行的阶段数", ["stage"])
+STAGE_FAILURES = Counter("video_maker_stage_failures_total", "阶段执行失败次数", ["stage"])
+RETRIES = Counter("video_maker_retries_total", "重试次数", ["stage"])
+
+PROVIDER_SECONDS = Histogram(
+    "video_maker_provider_seconds", "供应商接口调用耗时", ["provider", "operation"], buckets=_BUCKETS
+)
+PROVIDER_IN_FLIGHT = Gauge("video_maker_provider_in_flight", "在途的供应商调用数", ["provider", "operation"])
+PROVIDER_ERRORS = Counter("video_maker_provider_errors_total", "供应商调用失败次数", ["provider", "operation"])
+TIMEOUTS = Counter("video_maker_timeouts_total", "超时次数", ["provider", "operation"])
+
+CACHE_LOOKUPS = Counter("video_maker_cache_lookups_total", "缓存查询次数", ["cache", "kind", "result"])
+
+
+def stage_name(node_name: str) -> str:
+    """任务图节点名去掉场景序号：image_3 -> image，merge_12 -> merge"""
+    return re.sub(r"_\d+$", "", node_name)
+
+
+@contextmanager
+def track_stage(stage: str, span_name: str = None, **span_args):
+    """记录阶段耗时、在途数与失败次数，并在任务时间线上记录区间（默认以阶段名命名）"""
+    STAGES_IN_FLIGHT.labels(stage).inc()
+    started = time.perf_counter()
+    try:
+        with tracing.span(span_name or stage, "stage", **span_args):
+            yield
+    except Exception:
+        STAGE_FAILURES.labels(stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+        STAGES_IN_FLIGHT.labels(stage).dec()
+
+
+@contextmanager
+def track_call(provider: str, operation: str):
+    """记录一次供应商调用的耗时、在途数、失败与超时次数"""
+    PROVIDER_IN_FLIGHT.labels(provider, operation).inc()
+    started = time.perf_counter()
+    try:
+        with tracing.span(f"{provider}.{operation}", "provider"):
+            yield
+    except (TimeoutError, asyncio.TimeoutError):
+        TIMEOUTS.labels(provider, operation).inc()
+        PROVIDER_ERRORS.labels(provider, operation).inc()
+        raise
+    except Exception:
+        PROVIDER_ERRORS.labels(provider, operation).inc()
+        raise
+    finally:
+        PROVIDER_SECONDS.labels(provider, operation).observe(time.perf_counter() - started)
+        PROVIDER_IN_FLIGHT.labels(provider, operation).dec()
+
+
+def instrument(provider: str, operation: str) -> Callable:
+    """track_call 的装饰器形式，同时支持同步函数与协程函数"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with track_call(provider, operation):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with track_call(provider, operation):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count_cache(cache: str, kind: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache, kind, "hit" if hit else "miss").inc()
+
+
+def render() -> tuple:
+    """/metrics 响应内容与类型"""
+    return generate_latest(), CONTENT_TYPE_LATEST
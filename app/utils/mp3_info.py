@@ -0,0 +1,84 @@
+import os
+import struct
+from pathlib import Path
+
+# 只解析 MPEG Layer III 帧头（TTS 输出格式），无需解码音频即可得到时长
+
+# 版本位 -> 采样率表
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG 1
+    2: (22050, 24000, 16000),  # MPEG 2
+    0: (11025, 12000, 8000),   # MPEG 2.5
+}
+
+# Layer III 比特率表（kbps）
+_BITRATES_V1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_BITRATES_V2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+
+
+def _skip_id3v2(f) -> int:
+    """跳过文件开头的 ID3v2 标签，返回音频数据起始位置"""
+    header = f.read(10)
+    if len(header) == 10 and header[:3] == b"ID3":
+        size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+        footer = 10 if header[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def _find_frame(f, start: int, limit: int = 64 * 1024):
+    """从 start 开始查找第一个有效的 Layer III 帧头"""
+    f.seek(start)
+    data = f.read(limit)
+    for pos in range(len(data) - 3):
+        if data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+            continue
+        header = struct.unpack(">I", data[pos:pos + 4])[0]
+        version = (header >> 19) & 0x3
+        layer = (header >> 17) & 0x3
+        bitrate_index = (header >> 12) & 0xF
+        rate_index = (header >> 10) & 0x3
+        if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+            continue
+        return start + pos, header, data[pos:]
+    raise ValueError("未找到 MP3 Layer III 帧头")
+
+
+def mp3_duration(path: Path) -> float:
+    """
+    读取 MP3 时长（秒）
+    VBR 文件按 Xing/Info/VBRI 头中的总帧数计算，CBR 文件按音频数据长度与比特率计算
+    :param path: MP3 文件路径
+    :return: 时长（秒）
+    """
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        audio_start = _skip_id3v2(f)
+        offset, header, frame = _find_frame(f, audio_start)
+
+        f.seek(max(0, file_size - 128))
+        if f.read(3) == b"TAG":
+            file_size -= 128
+
+    version = (header >> 19) & 0x3
+    mono = ((header >> 6) & 0x3) == 3
+    sample_rate = _SAMPLE_RATES[version][(header >> 10) & 0x3]
+    samples_per_frame = 1152 if version == 3 else 576
+    bitrate = (_BITRATES_V1 if version == 3 else _BITRATES_V2)[(header >> 12) & 0xF] * 1000
+
+    # Xing/Info 头位于首帧的边信息之后
+    if version == 3:
+        xing_offset = 4 + (17 if mono else 32)
+    else:
+        xing_offset = 4 + (9 if mono else 17)
+    tag = frame[xing_offset:xing_offset + 4]
+    if tag in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", frame[xing_offset + 4:xing_offset + 8])[0]
+        if flags & 0x1:
+            frames = struct.unpack(">I", frame[xing_offset + 8:xing_offset + 12])[0]
+            return frames * samples_per_frame / sample_rate
+    if frame[36:40] == b"VBRI":
+        frames = struct.unpack(">I", frame[50:54])[0]
+        return frames * samples_per_frame / sample_rate
+
+    return (file_size - offset) * 8 / bitrate
@@ -0,0 +1,180 @@
+import cProfile
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from app.config import BASE_DIR, settings
+from app.utils import tracing
+
+PROFILE_FILE = "profile.prof"
+COLLAPSED_FILE = "profile.collapsed"
+
+# 当前协程/线程所属任务的性能剖析，随 asyncio 任务与 run_io 传递
+_current: ContextVar[Optional["JobProfile"]] = ContextVar("job_profile", default=None)
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if "site-packages" in filename:
+        filename = filename.rsplit("site-packages", 1)[1].lstrip(os.sep)
+    elif filename.startswith(str(BASE_DIR)):
+        filename = os.path.relpath(filename, BASE_DIR)
+    # 折叠栈格式以分号分隔帧
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _collapse(frame, root: str) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.append(root)
+    return ";".join(reversed(labels))
+
+
+class Sampler:
+    """
+    采样剖析器：后台线程按固定间隔读取登记线程的调用栈，累计为折叠栈（flamegraph.pl、speedscope 可直接读取）
+    只读取栈帧，不挂钩函数调用，开销与采样间隔成正比
+    """
+
+    def __init__(self, interval: float = None):
+        self.interval = interval or settings.PROFILE_SAMPLE_INTERVAL
+        self.stacks: Counter = Counter()
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @contextmanager
+    def attach(self, root: str):
+        """采样当前线程，折叠栈以 root 为根帧"""
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] = root
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._thread.start()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._threads.pop(ident, None)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, root in self._threads.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        self.stacks[_collapse(frame, root)] += 1
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def snapshot(self) -> Counter:
+        with self._lock:
+            return Counter(self.stacks)
+
+
+class _Snapshot:
+    """子进程 cProfile 的统计数据，供 pstats.Stats 加载"""
+
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class JobProfile:
+    """
+    单个任务的性能剖析
+    I/O 线程池中的调用（图片编码、校验等）只做采样；编码进程池中的调用（moviepy 合成等）
+    在子进程内同时做 cProfile 与采样，结果回传后合并。事件循环线程由多个任务共享，不做采样
+    """
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.sampler = Sampler()
+        self._stats: Optional[pstats.Stats] = None
+        self._process_stacks: Counter = Counter()
+
+    def merge(self, stats: dict, stacks: Counter):
+        """合并一次子进程调用的剖析结果"""
+        if stats:
+            if self._stats is None:
+                self._stats = pstats.Stats(_Snapshot(stats))
+            else:
+                self._stats.add(_Snapshot(stats))
+        self._process_stacks.update(stacks)
+
+    def write(self, task_dir: Path):
+        """写入 profile.prof（cProfile，snakeviz / python -m pstats 可读）与 profile.collapsed（折叠栈）"""
+        os.makedirs(task_dir, exist_ok=True)
+        if self._stats is not None:
+            self._stats.dump_stats(str(Path(task_dir) / PROFILE_FILE))
+        stacks = self.sampler.snapshot() + self._process_stacks
+        tmp_path = Path(task_dir) / f"{COLLAPSED_FILE}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        os.replace(tmp_path, Path(task_dir) / COLLAPSED_FILE)
+
+    def close(self):
+        self.sampler.stop()
+
+
+def start(task_id: str, enabled: bool = True) -> Optional[JobProfile]:
+    """
+    为当前上下文开启任务剖析，之后创建的协程与 run_io 调用都会被剖析
+    enabled 为 False 时清除上下文中残留的剖析（同一 worker 协程会先后执行多个任务）
+    """
+    profile = JobProfile(task_id) if enabled else None
+    _current.set(profile)
+    return profile
+
+
+def current() -> Optional[JobProfile]:
+    return _current.get()
+
+
+def stack_root(func: Callable) -> str:
+    """折叠栈的根帧：任务图节点;函数名"""
+    func = getattr(func, "func", func)  # functools.partial 取被包装的函数
+    return f"{tracing.current_lane()};{getattr(func, '__name__', 'call')}"
+
+
+def sample_call(profile: JobProfile, func: Callable, *args, **kwargs) -> Any:
+    """在当前线程执行 func 并采样其调用栈"""
+    with profile.sampler.attach(stack_root(func)):
+        return func(*args, **kwargs)
+
+
+def profiled_call(root: str, func: Callable, *args, **kwargs) -> tuple:
+    """
+    在编码子进程中以 cProfile 与采样执行 func
+    :return: (func 的返回值, cProfile 统计, 折叠栈计数)
+    """
+    sampler = Sampler()
+    profiler = cProfile.Profile()
+    try:
+        with sampler.attach(root):
+            profiler.enable()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                profiler.disable()
+    finally:
+        sampler.stop()
+    profiler.create_stats()
+    return result, profiler.stats, sampler.stacks
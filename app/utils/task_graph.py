@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Iterable
+
+from app.utils import metrics, tracing
+from app.utils.executors import run_io
+
+logger = logging.getLogger(__name__)
+
+
+class TaskGraphError(Exception):
+    """任务图执行异常"""
+    pass
+
+
+class _Node:
+    def __init__(self, name: str, func: Callable, deps: tuple, retries: int):
+        self.name = name
+        self.func = func
+        self.deps = deps
+        self.retries = max(1, retries)
+
+
+class TaskGraph:
+    """
+    依赖图执行器
+    节点在其全部依赖完成后立即调度，同时运行的节点数受 max_concurrency 限制。
+    同步函数放入全局 I/O 线程池执行，协程函数直接在事件循环中执行；
+    节点函数按 deps 的顺序接收依赖节点的返回值作为位置参数。
+    运行期间协程节点可以继续 add 新节点（如流式分镜逐个加入场景），新节点会被立即调度。
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.results: Dict[str, Any] = {}
+        self._nodes: Dict[str, _Node] = {}
+        self._changed = None
+
+    def add(self, name: str, func: Callable, deps: Iterable[str] = (), retries: int = 1) -> str:
+        """
+        添加节点
+        :param name: 节点名称（图内唯一）
+        :param func: 节点函数
+        :param deps: 依赖节点名称，必须已经添加（保证无环）
+        :param retries: 最大尝试次数
+        :return: 节点名称
+        """
+        if name in self._nodes:
+            raise ValueError(f"节点 {name} 已存在")
+        deps = tuple(deps)
+        for dep in deps:
+            if dep not in self._nodes:
+                raise ValueError(f"节点 {name} 依赖的 {dep} 不存在")
+        self._nodes[name] = _Node(name, func, deps, retries)
+        if self._changed is not None:
+            self._changed.set()
+        return name
+
+    async def run(self) -> Dict[str, Any]:
+        """执行整张图，任一节点最终失败时取消其余节点并抛出异常"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        running: Dict[asyncio.Task, str] = {}
+        started = set()
+        self._changed = asyncio.Event()
+
+        try:
+            while True:
+                for node in list(self._nodes.values()):
+                    if node.name in started:
+                        continue
+                    if all(dep in self.results for dep in node.deps):
+                        started.add(node.name)
+                        task = asyncio.ensure_future(self._run_node(node, semaphore))
+                        running[task] = node.name
+
+                if not running:
+                    break
+
+                # 任一节点完成或有新节点加入时重新调度
+                self._changed.clear()
+                changed = asyncio.ensure_future(self._changed.wait())
+                done, _ = await asyncio.wait([*running.keys(), changed], return_when=asyncio.FIRST_COMPLETED)
+                changed.cancel()
+                for task in done:
+                    if task is changed:
+                        continue
+                    name = running.pop(task)
+                    self.results[name] = task.result()
+        finally:
+            self._changed = None
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running.keys(), return_exceptions=True)
+
+        return self.results
+
+    async def _run_node(self, node: _Node, semaphore: asyncio.Semaphore) -> Any:
+        args = [self.results[dep] for dep in node.deps]
+        stage = metrics.stage_name(node.name)
+        async with semaphore:
+            for attempt in range(1, node.retries + 1):
+                try:
+                    with tracing.lane(node.name), metrics.track_stage(stage, node.name, attempt=attempt):
+                        return await self._call(node.func, args)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"节点 {node.name} 第 {attempt}/{node.retries} 次执行失败: {str(e)}")
+                    if attempt >= node.retries:
+                        raise TaskGraphError(f"节点 {node.name} 达到最大重试次数: {str(e)}") from e
+                    metrics.RETRIES.labels(stage).inc()
+
+    async def _call(self, func: Callable, args: list) -> Any:
+        if asyncio.iscoroutinefunction(func):
+            return await func(*args)
+        return await run_io(func, *args)
+
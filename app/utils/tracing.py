@@ -0,0 +1,140 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional
+
+TRACE_FILE = "trace.json"
+
+# 当前协程/线程所属的任务追踪与泳道（任务图节点名），随 asyncio 任务与 run_io 传递
+_current: ContextVar[Optional["TaskTrace"]] = ContextVar("task_trace", default=None)
+_lane: ContextVar[str] = ContextVar("trace_lane", default="pipeline")
+
+
+class TaskTrace:
+    """
+    单个任务的时间线，导出为 Chrome trace-event 格式（chrome://tracing、Perfetto 可直接打开）
+    每个任务图节点一条泳道（tid），编码子进程按进程号单独成组（pid）
+    """
+
+    def __init__(self, task_id: str, attempt: int = 1):
+        self.task_id = task_id
+        self.attempt = attempt
+        self.pid = os.getpid()
+        self._events: List[dict] = []
+        self._lanes: Dict[str, int] = {}
+        self._processes = set()
+        self._lock = threading.Lock()
+        self._meta("process_name", self.pid, 0, {"name": f"task {task_id} (attempt {attempt})"})
+
+    def _meta(self, name: str, pid: int, tid: int, args: dict):
+        self._events.append({"name": name, "ph": "M", "pid": pid, "tid": tid, "args": args})
+
+    def _tid(self, lane: str) -> int:
+        tid = self._lanes.get(lane)
+        if tid is None:
+            tid = self._lanes[lane] = len(self._lanes) + 1
+            self._meta("thread_name", self.pid, tid, {"name": lane})
+            self._meta("thread_sort_index", self.pid, tid, {"sort_index": tid})
+        return tid
+
+    def add(self, name: str, cat: str, start: float, end: float, lane: Optional[str] = None,
+            pid: Optional[int] = None, args: Optional[dict] = None):
+        """
+        记录一个已结束的区间
+        :param start: 开始时间（time.time()，跨进程可比）
+        :param end: 结束时间
+        :param lane: 泳道，默认取当前上下文的泳道
+        :param pid: 事件发生的进程，默认本进程（编码子进程传其进程号）
+        """
+        with self._lock:
+            if pid is None or pid == self.pid:
+                pid, tid = self.pid, self._tid(lane or _lane.get())
+            else:
+                tid = 1
+                if pid not in self._processes:
+                    self._processes.add(pid)
+                    self._meta("process_name", pid, 0, {"name": f"encode worker {pid}"})
+            self._events.append({
+                "name": name, "cat": cat, "ph": "X", "pid": pid, "tid": tid,
+                "ts": int(start * 1e6), "dur": max(0, int((end - start) * 1e6)),
+                "args": args or {}
+            })
+
+    def instant(self, name: str, cat: str, args: Optional[dict] = None):
+        with self._lock:
+            self._events.append({
+                "name": name, "cat": cat, "ph": "i", "s": "t", "pid": self.pid, "tid": self._tid(_lane.get()),
+                "ts": int(time.time() * 1e6), "args": args or {}
+            })
+
+    def write(self, path: Path):
+        """原子写入，执行中途也可读取（续租时刷新）"""
+        with self._lock:
+            data = {
+                "traceEvents": list(self._events),
+                "displayTimeUnit": "ms",
+                "otherData": {"task_id": self.task_id, "attempt": self.attempt}
+            }
+        path = Path(path)
+        os.makedirs(path.parent, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+def start(task_id: str, attempt: int = 1) -> TaskTrace:
+    """为当前上下文开启任务追踪，之后创建的协程与 run_io 调用都会记录到该追踪"""
+    trace = TaskTrace(task_id, attempt)
+    _current.set(trace)
+    return trace
+
+
+def current() -> Optional[TaskTrace]:
+    return _current.get()
+
+
+def current_lane() -> str:
+    return _lane.get()
+
+
+@contextmanager
+def lane(name: str):
+    """把其中的区间归入指定泳道（任务图节点）"""
+    token = _lane.set(name)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+@contextmanager
+def span(name: str, cat: str = "stage", **args):
+    """记录一个区间；未开启追踪时不做任何事"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.time()
+    try:
+        yield
+    except asyncio.CancelledError:
+        args["cancelled"] = True
+        raise
+    except Exception as e:
+        args["error"] = str(e)[:200]
+        raise
+    finally:
+        trace.add(name, cat, started, time.time(), args=args)
+
+
+def instant(name: str, cat: str = "event", **args):
+    """记录一个瞬时事件（如发出对冲请求）"""
+    trace = _current.get()
+    if trace is not None:
+        trace.instant(name, cat, args)
@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+
+from prometheus_client import start_http_server
+
+from app.config import settings
+from app.services import job_queue, pipeline, warmup
+from app.services.image_gen import ImageGenerator
+from app.services.remote_journal import RemoteJournal
+from app.utils import executors, metrics, profiling, tracing
+from app.utils.executors import run_io
+
+logger = logging.getLogger(__name__)
+
+
+def new_worker_id() -> str:
+    """主机名 + 进程号 + 随机后缀，保证共享存储上的 worker 标识唯一"""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+async def _keep_lease(task_id: str, worker_id: str, job_task: asyncio.Task, trace: tracing.TaskTrace):
+    """定期续期租约并刷新任务时间线，租约被接管时取消正在执行的任务"""
+    trace_path = settings.TEMP_DIR / task_id / tracing.TRACE_FILE
+    while True:
+        await asyncio.sleep(settings.JOB_LEASE_TTL / 3)
+        try:
+            await run_io(trace.write, trace_path)
+        except OSError as e:
+            logger.warning(f"任务 {task_id} 时间线写入失败: {str(e)}")
+        try:
+            await run_io(job_queue.heartbeat, task_id, worker_id)
+        except job_queue.LeaseLostError as e:
+            logger.error(str(e))
+            job_task.cancel()
+            return
+        except OSError as e:
+            logger.error(f"任务 {task_id} 续期失败: {str(e)}")
+
+
+async def _run_job(record, worker_id: str, image_generator: ImageGenerator):
+    task_dir = settings.TEMP_DIR / record.task_id
+    # 重试的任务从检查点续跑，不重复生成已完成的场景
+    resume = record.request.resume or record.attempts > 1
+    # 之后创建的协程都记录到本任务的时间线
+    trace = tracing.start(record.task_id, record.attempts)
+    profile_enabled = settings.PROFILE_JOBS if record.request.profile is None else record.request.profile
+    profile = profiling.start(record.task_id, profile_enabled)
+    job_task = asyncio.ensure_future(pipeline.process_video(record.request, task_dir, image_generator, resume))
+    lease_task = asyncio.ensure_future(_keep_lease(record.task_id, worker_id, job_task, trace))
+    metrics.JOBS_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    try:
+        final_path = await job_task
+        metrics.JOB_SECONDS.observe(time.perf_counter() - started)
+        metrics.JOBS.labels("succeeded").inc()
+        await run_io(job_queue.complete, record.task_id, worker_id, str(final_path))
+        await run_io(RemoteJournal(task_dir).cleanup)
+    except asyncio.CancelledError:
+        metrics.JOBS.labels("cancelled").inc()
+        logger.error(f"任务 {record.task_id} 已取消")
+        if not lease_task.done():
+            # worker 自身被停止：释放租约，让其他 worker 尽快接手（同步执行，执行器可能已关闭）
+            try:
+                job_queue.requeue(record.task_id, worker_id)
+            except job_queue.LeaseLostError as e:
+                logger.error(str(e))
+            raise
+    except job_queue.LeaseLostError as e:
+        # 租约已被其他 worker 接管，任务状态由新的持有者负责
+        logger.error(str(e))
+    except Exception as e:
+        metrics.JOBS.labels("failed").inc()
+        logger.error(f"任务失败：{str(e)}", exc_info=True)
+        try:
+            record = await run_io(job_queue.fail, record.task_id, worker_id, str(e))
+        except job_queue.LeaseLostError as lease_error:
+            logger.error(str(lease_error))
+        else:
+            if record.status == "failed":
+                # 不再重试：删除仍在远端排队或生成的任务
+                await run_io(RemoteJournal(task_dir).cleanup)
+    finally:
+        metrics.JOBS_IN_FLIGHT.dec()
+        lease_task.cancel()
+        try:
+            # 同步写入：worker 停止时执行器可能已关闭
+            trace.write(task_dir / tracing.TRACE_FILE)
+        except OSError as e:
+            logger.warning(f"任务 {record.task_id} 时间线写入失败: {str(e)}")
+        if profile is not None:
+            profile.close()
+            try:
+                profile.write(task_dir)
+            except OSError as e:
+                logger.warning(f"任务 {record.task_id} 剖析结果写入失败: {str(e)}")
+
+
+async def _worker_slot(worker_id: str, image_generator: ImageGenerator):
+    while True:
+        record = await run_io(job_queue.claim, worker_id)
+        if record is None:
+            await asyncio.sleep(settings.WORKER_POLL_INTERVAL)
+            continue
+        await _run_job(record, worker_id, image_generator)
+
+
+async def run_worker(concurrency: int = None, worker_id: str = None):
+    """
+    worker 主循环：不断领取并执行任务
+    :param concurrency: 同时处理的任务数
+    :param worker_id: worker 标识，默认自动生成
+    """
+    concurrency = concurrency or settings.WORKER_CONCURRENCY
+    worker_id = worker_id or new_worker_id()
+    os.makedirs(settings.TEMP_DIR, exist_ok=True)
+    image_generator = ImageGenerator()
+
+    logger.info(f"worker {worker_id} 启动，并发 {concurrency}，任务目录 {settings.TEMP_DIR}")
+    if settings.TTS_BATCH and settings.STORYBOARD_STREAMING:
+        logger.warning("流式分镜已开启，批量语音（TTS_BATCH）只对非流式任务生效；需要批量语音时设置 STORYBOARD_STREAMING=0")
+    warm_up_task = asyncio.ensure_future(warmup.warm_up(image_generator)) if settings.WARM_UP else None
+    try:
+        await asyncio.gather(*[
+            _worker_slot(worker_id, image_generator) for _ in range(concurrency)
+        ])
+    finally:
+        if warm_up_task is not None:
+            warm_up_task.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="视频渲染 worker")
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY, help="同时处理的任务数")
+    parser.add_argument("--worker-id", default=None, help="worker 标识，默认 主机名-进程号-随机后缀")
+    parser.add_argument("--metrics-port", type=int, default=settings.WORKER_METRICS_PORT,
+                        help="Prometheus 指标端口，0 表示不提供")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+    try:
+        asyncio.run(run_worker(args.concurrency, args.worker_id))
+    except KeyboardInterrupt:
+        logger.info("worker 已停止")
+    finally:
+        executors.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+API 进程导入耗时基准：在全新的解释器中多次导入 app.main，统计导入耗时、
+按顶层包汇总的导入耗时（python -X importtime），并检查重型模块是否被提前加载
+
+    python -m bench.import_time --runs 5 --max-seconds 1.5
+
+超出 --max-seconds 或加载了 --forbid 中的模块时以非零状态退出，可直接用于 CI
+"""
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# API 进程启动时不应加载的模块（由 worker 按需加载或后台预热）
+HEAVY_MODULES = ("moviepy", "openai", "volcenginesdkarkruntime", "volcengine", "PIL", "numpy", "imageio")
+
+CHILD = """
+import importlib, json, sys, time
+started = time.perf_counter()
+importlib.import_module({module!r})
+print(json.dumps({{"seconds": time.perf_counter() - started, "modules": sorted(sys.modules)}}))
+"""
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def measure(module: str) -> dict:
+    """在全新的解释器中导入一次 module"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(module=module)],
+        cwd=BASE_DIR, capture_output=True, text=True, check=False
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr[-2000:]}")
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+
+    # 各模块自身耗时按顶层包汇总（微秒）
+    packages: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            package = match.group(4).split(".")[0]
+            packages[package] = packages.get(package, 0) + int(match.group(1))
+    return {"seconds": data["seconds"], "wall": wall, "modules": data["modules"], "packages": packages}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API 进程导入耗时基准")
+    parser.add_argument("--module", default="app.main", help="导入的模块")
+    parser.add_argument("--runs", type=int, default=5, help="测量次数，取中位数")
+    parser.add_argument("--top", type=int, default=15, help="输出耗时最多的顶层包数量")
+    parser.add_argument("--max-seconds", type=float, default=None, help="导入耗时中位数上限，超出时退出码为 1")
+    parser.add_argument("--forbid", default=",".join(HEAVY_MODULES), help="不应被加载的顶层包，逗号分隔，空字符串表示不检查")
+    parser.add_argument("--json", help="结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    packages: Dict[str, List[int]] = {}
+    for run in runs:
+        for package, micros in run["packages"].items():
+            packages.setdefault(package, []).append(micros)
+    top = sorted(((statistics.median(v) / 1e6, k) for k, v in packages.items()), reverse=True)[:args.top]
+
+    forbidden = [name for name in args.forbid.split(",") if name]
+    loaded = sorted({
+        module for module in runs[-1]["modules"] if module.split(".")[0] in forbidden
+    })
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "import_seconds": statistics.median(run["seconds"] for run in runs),
+        "process_seconds": statistics.median(run["wall"] for run in runs),
+        "packages": {name: seconds for seconds, name in top},
+        "forbidden_loaded": loaded,
+    }
+
+    print(f"导入 {args.module}：中位数 {report['import_seconds']:.3f}s（含解释器启动 {report['process_seconds']:.3f}s），"
+          f"共 {args.runs} 次")
+    print(f"{'顶层包':<32}{'导入耗时':>10}")
+    for seconds, name in top:
+        print(f"{name:<32}{seconds:>10.3f}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    failed = False
+    if loaded:
+        print(f"启动时加载了重型模块: {', '.join(sorted({m.split('.')[0] for m in loaded}))}")
+        failed = True
+    if args.max_seconds is not None and report["import_seconds"] > args.max_seconds:
+        print(f"导入耗时 {report['import_seconds']:.3f}s 超过上限 {args.max_seconds}s")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import io
+import subprocess
+from pathlib import Path
+
+import imageio_ffmpeg
+from PIL import Image
+
+# 替身服务返回的合成产物：真实格式、内容无意义，足以走完整条编码流水线
+
+# MPEG-1 Layer III，128 kbps，44.1 kHz，单声道，不含填充位
+_MP3_HEADER = bytes([0xFF, 0xFB, 0x90, 0xC4])
+_MP3_FRAME_SIZE = 144 * 128000 // 44100
+_MP3_FRAME_SECONDS = 1152 / 44100
+
+
+def jpeg(width: int = 384, height: int = 512, seed: int = 0) -> bytes:
+    """纯色 JPEG，颜色随 seed 变化"""
+    color = ((seed * 67) % 256, (seed * 131) % 256, (seed * 29) % 256)
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def mp3(seconds: float) -> bytes:
+    """静音 MP3：边信息全零的帧解码为静音，时长按帧数精确计算"""
+    frames = max(1, round(seconds / _MP3_FRAME_SECONDS))
+    frame = _MP3_HEADER + bytes(_MP3_FRAME_SIZE - len(_MP3_HEADER))
+    return frame * frames
+
+
+def mp4(path: Path, seconds: int, width: int = 720, height: int = 1280, fps: int = 24) -> Path:
+    """用 ffmpeg 测试图案生成 H.264 视频（已存在则直接复用）"""
+    path = Path(path)
+    if path.exists():
+        return path
+    tmp_path = path.with_name(path.name + ".part.mp4")
+    subprocess.run(
+        [
+            imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"testsrc=size={width}x{height}:rate={fps}",
+            "-t", str(seconds), "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+            str(tmp_path)
+        ],
+        check=True
+    )
+    tmp_path.replace(path)
+    return path
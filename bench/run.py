@@ -0,0 +1,288 @@
+"""
+离线端到端压测：启动供应商替身服务与 API 服务，按指定并发驱动 /create_video，
+汇总各阶段与端到端耗时分位数、吞吐量、CPU 时间与峰值内存
+
+    python -m bench.run --jobs 20 --concurrency 4 --time-scale 0.1 --json bench-result.json
+
+资源统计读取 /proc，仅支持 Linux
+"""
+import argparse
+import json
+import math
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+INPUT_CONTENT = "城市夜景中的霓虹灯与街角的咖啡馆，讲述一个普通人深夜下班回家的故事。"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def http_json(method: str, url: str, body: Optional[dict] = None, timeout: float = 10) -> dict:
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"服务启动失败: {url}")
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return
+        except OSError:
+            time.sleep(0.3)
+    raise TimeoutError(f"服务启动超时: {url}")
+
+
+def percentile(samples: List[float], p: float) -> Optional[float]:
+    """最近邻法分位数（与 app.utils.latency 一致）"""
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, max(0, math.ceil(p / 100 * len(samples)) - 1))]
+
+
+def summarize(samples: List[float]) -> dict:
+    return {
+        "count": len(samples),
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+    }
+
+
+class ProcessTreeSampler:
+    """定期采样进程树（API 服务、编码进程池、ffmpeg 子进程）的 CPU 时间与常驻内存"""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = 0
+        self._baseline_cpu: Optional[float] = None
+        self._cpu = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def _stat(pid: int) -> Optional[List[str]]:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                # 进程名可能包含空格，从右括号之后切分
+                return f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return None
+
+    def _tree(self) -> List[int]:
+        children: Dict[int, List[int]] = {}
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                fields = self._stat(int(entry))
+                if fields is not None:
+                    children.setdefault(int(fields[1]), []).append(int(entry))
+        tree, stack = [], [self.pid]
+        while stack:
+            pid = stack.pop()
+            tree.append(pid)
+            stack.extend(children.get(pid, []))
+        return tree
+
+    def sample(self):
+        rss, cpu = 0, 0.0
+        for pid in self._tree():
+            fields = self._stat(pid)
+            if fields is None:
+                continue
+            # utime stime cutime cstime：已退出并被回收的子进程计入父进程的 cutime/cstime
+            cpu += sum(int(v) for v in fields[11:15]) / CLK_TCK
+            rss += int(fields[21]) * PAGE_SIZE
+        self.peak_rss = max(self.peak_rss, rss)
+        self._cpu = max(self._cpu, cpu)
+        if self._baseline_cpu is None:
+            self._baseline_cpu = cpu
+
+    def cpu_seconds(self) -> float:
+        """采样开始以来进程树消耗的 CPU 时间（不含服务启动）"""
+        return self._cpu - (self._baseline_cpu or 0.0)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self.sample()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+
+def stage_offsets(task_dir: Path, created_at: float) -> Dict[str, float]:
+    """清单中各阶段完成时刻（相对任务创建）；同类阶段（image_0、image_1…）取最晚者"""
+    try:
+        stages = json.loads((task_dir / "manifest.json").read_text(encoding="utf-8"))["stages"]
+    except (OSError, ValueError, KeyError):
+        return {}
+    offsets = {}
+    for stage, entry in stages.items():
+        name = re.sub(r"_\d+$", "", stage)
+        offsets[name] = max(offsets.get(name, 0.0), entry["completed_at"] - created_at)
+    return offsets
+
+
+def run_jobs(api: str, jobs: int, concurrency: int, request: dict, poll_interval: float = 0.5) -> List[dict]:
+    """保持 concurrency 个任务在途，直到提交并完成 jobs 个任务"""
+    results, in_flight, submitted = [], {}, 0
+    while submitted < jobs or in_flight:
+        while submitted < jobs and len(in_flight) < concurrency:
+            task_id = http_json("POST", f"{api}/create_video", request)["task_id"]
+            in_flight[task_id] = time.time()
+            submitted += 1
+        time.sleep(poll_interval)
+        for task_id in list(in_flight):
+            record = http_json("GET", f"{api}/tasks/{task_id}")
+            if record["status"] in ("succeeded", "failed"):
+                in_flight.pop(task_id)
+                results.append(record)
+                print(f"[{len(results)}/{jobs}] {task_id} {record['status']} "
+                      f"{record['updated_at'] - record['created_at']:.1f}s", flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线端到端压测")
+    parser.add_argument("--jobs", type=int, default=10, help="任务总数")
+    parser.add_argument("--concurrency", type=int, default=2, help="同时在途的任务数")
+    parser.add_argument("--time-scale", type=float, default=0.1, help="替身服务耗时缩放系数")
+    parser.add_argument("--latency", default="{}", help='替身接口耗时覆盖，如 \'{"image": [3, 0.3]}\'')
+    parser.add_argument("--input", default=INPUT_CONTENT, help="任务输入文案")
+    parser.add_argument("--long-form", action="store_true", help="长视频模式")
+    parser.add_argument("--env", action="append", default=[], help="API 服务的额外环境变量 KEY=VALUE，可重复")
+    parser.add_argument("--json", help="结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="video-maker-bench-"))
+    standin_port, api_port = free_port(), free_port()
+    standin = f"http://127.0.0.1:{standin_port}"
+    api = f"http://127.0.0.1:{api_port}"
+
+    standin_env = {
+        **os.environ,
+        "BENCH_LATENCY": args.latency,
+        "BENCH_TIME_SCALE": str(args.time_scale),
+        "BENCH_PAYLOAD_DIR": str(work_dir / "payloads"),
+    }
+    api_env = {
+        **os.environ,
+        "DEEPSEEK_URL": f"{standin}/deepseek",
+        "VOLCANO_VISUAL_HOST": f"127.0.0.1:{standin_port}",
+        "VOLCANO_VISUAL_SCHEME": "http",
+        "ARK_BASE_URL": f"{standin}/ark/api/v3",
+        "TTS_API_ENDPOINT": f"{standin}/tts/api/v1/tts",
+        "DASHSCOPE_API_KEY": "bench", "ARK_API_KEY": "bench", "VIDEO_GENERATION_MODEL_EP": "bench",
+        "VOLCANO_ACCESS_KEY": "bench", "VOLCANO_SECRET_KEY": "bench", "APPID": "bench", "ACCESS_TOKEN": "bench",
+        "TEMP_DIR": str(work_dir / "tasks"),
+        "EMBEDDED_WORKERS": str(args.concurrency),
+        "VIDEO_ENGINE": "ark",
+        # 每个任务都真实走完所有阶段
+        "ARTIFACT_CACHE_ENABLED": "0",
+        "LLM_CACHE_ENABLED": "0",
+    }
+    for item in args.env:
+        key, _, value = item.partition("=")
+        api_env[key] = value
+
+    uvicorn = [sys.executable, "-m", "uvicorn", "--host", "127.0.0.1", "--log-level", "warning"]
+    processes = []
+    try:
+        processes.append(subprocess.Popen(
+            uvicorn + ["--port", str(standin_port), "bench.standins:app"], cwd=BASE_DIR, env=standin_env
+        ))
+        wait_ready(f"{standin}/docs", processes[-1])
+        api_log = open(work_dir / "api.log", "w")
+        api_process = subprocess.Popen(
+            uvicorn + ["--port", str(api_port), "app.main:app"],
+            cwd=BASE_DIR, env=api_env, stdout=api_log, stderr=subprocess.STDOUT
+        )
+        processes.append(api_process)
+        wait_ready(f"{api}/docs", api_process)
+
+        request = {"input_content": args.input, "long_form": args.long_form}
+        sampler = ProcessTreeSampler(api_process.pid)
+        sampler.start()
+        started = time.time()
+        records = run_jobs(api, args.jobs, args.concurrency, request)
+        wall = time.time() - started
+        sampler.stop()
+        # 保存服务端指标快照，便于按供应商/阶段分析耗时
+        with urllib.request.urlopen(f"{api}/metrics", timeout=10) as response:
+            (work_dir / "metrics.txt").write_bytes(response.read())
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+
+    succeeded = [r for r in records if r["status"] == "succeeded"]
+    stages: Dict[str, List[float]] = {}
+    for record in succeeded:
+        for name, offset in stage_offsets(work_dir / "tasks" / record["task_id"], record["created_at"]).items():
+            stages.setdefault(name, []).append(offset)
+
+    report = {
+        "jobs": len(records),
+        "succeeded": len(succeeded),
+        "concurrency": args.concurrency,
+        "time_scale": args.time_scale,
+        "wall_seconds": wall,
+        "throughput_per_minute": len(succeeded) / wall * 60,
+        "end_to_end": summarize([r["updated_at"] - r["created_at"] for r in succeeded]),
+        "stage_completed_at": {name: summarize(values) for name, values in sorted(stages.items())},
+        "cpu_seconds": sampler.cpu_seconds(),
+        "cpu_utilization": sampler.cpu_seconds() / wall / (os.cpu_count() or 1),
+        "peak_rss_mb": sampler.peak_rss / 1024 / 1024,
+        "work_dir": str(work_dir),
+    }
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def print_report(report: dict):
+    def fmt(value):
+        return "-" if value is None else f"{value:.2f}"
+
+    print()
+    print(f"任务 {report['succeeded']}/{report['jobs']} 成功，并发 {report['concurrency']}，"
+          f"耗时缩放 {report['time_scale']}，总用时 {report['wall_seconds']:.1f}s")
+    print(f"吞吐量 {report['throughput_per_minute']:.2f} 个/分钟，CPU {report['cpu_seconds']:.1f}s "
+          f"（利用率 {report['cpu_utilization']:.0%}），峰值内存 {report['peak_rss_mb']:.0f} MB")
+    print(f"{'阶段（完成时刻）':<24}{'p50':>10}{'p95':>10}{'p99':>10}")
+    rows = [("end_to_end", report["end_to_end"])] + list(report["stage_completed_at"].items())
+    for name, stats in rows:
+        print(f"{name:<24}{fmt(stats['p50']):>10}{fmt(stats['p95']):>10}{fmt(stats['p99']):>10}")
+
+
+if __name__ == "__main__":
+    main()
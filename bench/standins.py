@@ -0,0 +1,260 @@
+"""
+供应商接口的本地替身服务：DeepSeek（OpenAI 兼容）、火山文生图、Ark 视频生成、火山 TTS
+按各自的接口形态返回合成的 JPEG / MP3 / MP4，耗时服从可配置的对数正态分布
+
+    BENCH_LATENCY='{"image": [3, 0.3]}' BENCH_TIME_SCALE=0.1 uvicorn bench.standins:app --port 9100
+
+BENCH_LATENCY：各接口耗时的 [中位数秒数, 对数标准差]，未指定的接口取 DEFAULT_LATENCY
+BENCH_TIME_SCALE：所有耗时的缩放系数，缩短一次压测的总时长
+"""
+import asyncio
+import base64
+import json
+import math
+import os
+import random
+import re
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, StreamingResponse
+
+from bench import payloads
+
+DEFAULT_LATENCY = {
+    "deepseek": [2.0, 0.4],   # 完整响应耗时（流式时首包约占三成）
+    "image": [3.0, 0.3],      # 文生图
+    "ark_video": [40.0, 0.3],  # Ark 从创建到生成完成
+    "tts": [1.0, 0.3],        # 单次语音合成
+    "api": [0.05, 0.2],       # 任务创建、查询、删除等轻量接口
+}
+
+LATENCY = {**DEFAULT_LATENCY, **json.loads(os.getenv("BENCH_LATENCY", "{}"))}
+TIME_SCALE = float(os.getenv("BENCH_TIME_SCALE", 1.0))
+PAYLOAD_DIR = Path(os.getenv("BENCH_PAYLOAD_DIR", Path(tempfile.gettempdir()) / "video-maker-bench"))
+
+# 每个中文字的朗读时长（秒）
+SECONDS_PER_CHAR = 0.22
+
+app = FastAPI()
+
+_image_tasks = {}
+_video_tasks = {}
+
+
+def sample(name: str) -> float:
+    median, sigma = LATENCY[name]
+    return random.lognormvariate(math.log(median), sigma) * TIME_SCALE
+
+
+async def delay(name: str):
+    await asyncio.sleep(sample(name))
+
+
+@app.on_event("startup")
+def prepare_payloads():
+    PAYLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    for seconds in (5, 10):
+        payloads.mp4(PAYLOAD_DIR / f"clip_{seconds}.mp4", seconds)
+    (PAYLOAD_DIR / "image.jpg").write_bytes(payloads.jpeg())
+
+
+@app.api_route("/files/{name}", methods=["GET", "HEAD"])
+async def files(name: str):
+    path = PAYLOAD_DIR / name
+    if not path.is_file():
+        raise HTTPException(status_code=404)
+    return FileResponse(path)
+
+
+# ---------- DeepSeek（OpenAI 兼容接口） ----------
+
+def _completion_text(prompt: str) -> str:
+    match = re.search(r"转换为(\d+)个视频分镜", prompt)
+    if match is None:
+        # 文案扩写
+        return "这是一段用于压测的合成文案。" * 20
+    scenes = [
+        {
+            "description": f"压测场景{idx}，城市夜景，霓虹灯下的街道，电影感构图",
+            "narration": f"这是第{idx}个场景的解说，夜色中的城市依旧灯火通明，行人匆匆走过街角。"
+        }
+        for idx in range(int(match.group(1)))
+    ]
+    return json.dumps(scenes, ensure_ascii=False, indent=2)
+
+
+def _completion_chunk(completion_id: str, delta: dict, finish_reason=None) -> str:
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": "deepseek-chat",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+    return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+
+@app.post("/deepseek/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    text = _completion_text(body["messages"][-1]["content"])
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    total = sample("deepseek")
+
+    if body.get("stream"):
+        async def stream():
+            pieces = [text[i:i + 20] for i in range(0, len(text), 20)]
+            await asyncio.sleep(total * 0.3)
+            yield _completion_chunk(completion_id, {"role": "assistant", "content": ""})
+            for piece in pieces:
+                await asyncio.sleep(total * 0.7 / len(pieces))
+                yield _completion_chunk(completion_id, {"content": piece})
+            yield _completion_chunk(completion_id, {}, "stop")
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    await asyncio.sleep(total)
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "deepseek-chat",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": 100, "completion_tokens": len(text), "total_tokens": 100 + len(text)}
+    }
+
+
+# ---------- 火山文生图（visual.volcengineapi.com，按 Action 分发） ----------
+
+def _image_result(request: Request, return_url: bool) -> dict:
+    if return_url:
+        return {"image_urls": [f"{request.base_url}files/image.jpg"]}
+    return {"binary_data_base64": [base64.b64encode((PAYLOAD_DIR / "image.jpg").read_bytes()).decode()]}
+
+
+@app.post("/")
+async def visual(request: Request, Action: str):
+    body = await request.json()
+    if Action == "CVProcess":
+        await delay("image")
+        return {"code": 10000, "message": "Success", "data": _image_result(request, body.get("return_url", False))}
+
+    if Action == "CVSync2AsyncSubmitTask":
+        await delay("api")
+        task_id = uuid.uuid4().hex
+        _image_tasks[task_id] = time.time() + sample("image")
+        return {"code": 10000, "message": "Success", "data": {"task_id": task_id}}
+
+    if Action == "CVSync2AsyncGetResult":
+        await delay("api")
+        ready_at = _image_tasks.get(body["task_id"])
+        if ready_at is None:
+            return {"code": 10000, "message": "Success", "data": {"status": "not_found"}}
+        if time.time() < ready_at:
+            return {"code": 10000, "message": "Success", "data": {"status": "generating"}}
+        _image_tasks.pop(body["task_id"], None)
+        req_json = json.loads(body.get("req_json") or "{}")
+        data = _image_result(request, req_json.get("return_url", False))
+        return {"code": 10000, "message": "Success", "data": {"status": "done", **data}}
+
+    raise HTTPException(status_code=400, detail=f"unsupported action {Action}")
+
+
+# ---------- Ark 视频生成任务 ----------
+
+def _video_task(request: Request, task: dict) -> dict:
+    now = time.time()
+    if task["status"] not in ("succeeded", "cancelled"):
+        task["status"] = "succeeded" if now >= task["ready_at"] else "running"
+    result = {
+        "id": task["id"],
+        "model": task["model"],
+        "status": task["status"],
+        "created_at": int(task["created_at"]),
+        "updated_at": int(now),
+        "usage": {"completion_tokens": 1000, "total_tokens": 1000}
+    }
+    if task["status"] == "succeeded":
+        result["content"] = {"video_url": f"{request.base_url}files/clip_{task['duration']}.mp4"}
+    return result
+
+
+@app.post("/ark/api/v3/contents/generations/tasks")
+async def create_video_task(request: Request):
+    body = await request.json()
+    await delay("api")
+    text = next((item["text"] for item in body["content"] if item.get("type") == "text"), "")
+    match = re.search(r"--dur\s+(\d+)", text)
+    task_id = f"cgt-{uuid.uuid4().hex}"
+    _video_tasks[task_id] = {
+        "id": task_id,
+        "model": body["model"],
+        "status": "queued",
+        "duration": 10 if match and int(match.group(1)) > 5 else 5,
+        "created_at": time.time(),
+        "ready_at": time.time() + sample("ark_video")
+    }
+    return {"id": task_id}
+
+
+@app.get("/ark/api/v3/contents/generations/tasks/{task_id}")
+async def get_video_task(request: Request, task_id: str):
+    await delay("api")
+    task = _video_tasks.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="task not found")
+    return _video_task(request, task)
+
+
+@app.get("/ark/api/v3/contents/generations/tasks")
+async def list_video_tasks(request: Request):
+    await delay("api")
+    task_ids = request.query_params.getlist("filter.task_ids")
+    items = [_video_task(request, _video_tasks[t]) for t in task_ids if t in _video_tasks]
+    return {"items": items, "total": len(items)}
+
+
+@app.delete("/ark/api/v3/contents/generations/tasks/{task_id}")
+async def delete_video_task(task_id: str):
+    await delay("api")
+    _video_tasks.pop(task_id, None)
+    return {}
+
+
+# ---------- 火山 TTS ----------
+
+_PUNCTUATION = set("，。！？；：、,.!?;:\"'“”‘’（）()《》…—- \t\n")
+
+
+@app.post("/tts/api/v1/tts")
+async def tts(request: Request):
+    body = await request.json()
+    text = body["request"]["text"]
+    await delay("tts")
+
+    # 逐字生成时间戳（毫秒），标点处停顿
+    words, cursor = [], 0.0
+    for ch in text:
+        length = 0.3 if ch in _PUNCTUATION else SECONDS_PER_CHAR
+        words.append({"word": ch, "start_time": round(cursor * 1000), "end_time": round((cursor + length) * 1000)})
+        cursor += length
+
+    response = {
+        "reqid": body["request"]["reqid"],
+        "code": 3000,
+        "message": "Success",
+        "sequence": -1,
+        "data": base64.b64encode(payloads.mp3(cursor)).decode(),
+        "addition": {"duration": str(round(cursor * 1000))}
+    }
+    if body["request"].get("with_frontend"):
+        response["addition"]["frontend"] = json.dumps({"words": words}, ensure_ascii=False)
+    return response